@@ -1,46 +1,37 @@
 import os
+import sys
 import json
-import fcntl
 from flask import Blueprint, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 import traceback
 
+# Node persistence is shared with the workflows server
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'workflows'))
+from node_store import create_node_store
+
 node_data = Blueprint('node_data', __name__)
 
 DATA_DIR = 'data'
 FILES_DIR = 'files'
 
-def atomic_write_json(data_path, data):
-    """Write data to a file atomically using a lock file"""
-    lock_path = data_path + '.lock'
-    temp_path = data_path + '.tmp'
-    
-    try:
-        # Ensure parent directory exists
-        os.makedirs(os.path.dirname(data_path), exist_ok=True)
-        
-        # Create lock file
-        with open(lock_path, 'w') as lock_file:
-            # Get exclusive lock
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
-            try:
-                # Write to temp file
-                with open(temp_path, 'w') as f:
-                    json.dump(data, f, indent=2)
-                    f.flush()
-                    os.fsync(f.fileno())
-                
-                # Atomic rename
-                os.replace(temp_path, data_path)
-            finally:
-                # Release lock
-                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
-    finally:
-        # Clean up
-        if os.path.exists(lock_path):
-            os.remove(lock_path)
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+_node_store = None
+
+def get_node_store():
+    """Get the node store for the data directory under the current working directory.
+
+    It is made by the same create_node_store as the workflows server's, so
+    both servers honour NODE_STORE and share one layout, one patch
+    implementation and one migration.
+    """
+    global _node_store
+    if _node_store is None:
+        _node_store = create_node_store(os.path.join(os.getcwd(), DATA_DIR))
+    return _node_store
+
+def load_node(node_name):
+    """Return the node's data with logged patches applied, or None if it does not exist"""
+    data, _, base_hash, _, _ = get_node_store().load(node_name)
+    return data if base_hash is not None else None
 
 @node_data.route('/test')
 def test():
@@ -48,27 +39,22 @@ def test():
     return jsonify({"status": "ok", "message": "Server is running"})
 
 def ensure_dirs(node_name):
-    """Ensure the data and files directories exist for a node"""
+    """Ensure the files directory exists for a node. Node data lives in the node store"""
     try:
         print(f"\n=== Ensuring directories for node: {node_name} ===")
         print(f"Current working directory: {os.getcwd()}")
         
         # Get absolute paths
         base_dir = os.getcwd()
-        node_data_dir = os.path.join(base_dir, DATA_DIR, node_name)
         node_files_dir = os.path.join(base_dir, DATA_DIR, FILES_DIR, node_name)
         
         # Create directories if they don't exist
-        os.makedirs(os.path.join(base_dir, DATA_DIR), exist_ok=True)
-        os.makedirs(node_data_dir, exist_ok=True)
-        os.makedirs(os.path.join(base_dir, DATA_DIR, FILES_DIR), exist_ok=True)
         os.makedirs(node_files_dir, exist_ok=True)
         
         print(f"Successfully created/verified directories:")
-        print(f"- Data dir: {node_data_dir}")
         print(f"- Files dir: {node_files_dir}")
         
-        return node_data_dir, node_files_dir
+        return node_files_dir
     except Exception as e:
         print(f"Error in ensure_dirs: {str(e)}")
         print(traceback.format_exc())
@@ -81,35 +67,28 @@ def handle_node_data(node_name):
         print(f"\n=== Handling {request.method} request for node: {node_name} ===")
         print(f"Current working directory: {os.getcwd()}")
         
-        # Ensure directories exist and get absolute paths
-        node_data_dir, _ = ensure_dirs(node_name)
-        data_path = os.path.join(node_data_dir, 'data.json')
-        print(f"Data path: {data_path}")
+        store = get_node_store()
         
         if request.method == 'GET':
-            if not os.path.exists(data_path):
-                print(f"File not found at: {data_path}")
-                return '', 404
-                
-            print(f"Reading file: {data_path}")
             try:
-                with open(data_path, 'r') as f:
-                    data = json.load(f)
-                    print(f"Successfully loaded data: {data}")
-                    return jsonify(data)
+                data = load_node(node_name)
             except json.JSONDecodeError:
-                print(f"Invalid JSON in file: {data_path}")
-                # If JSON is invalid, delete the file and return 404
-                os.remove(data_path)
+                print(f"Invalid JSON stored for node: {node_name}")
+                # If JSON is invalid, delete the node and return 404
+                store.delete(node_name)
+                return '', 404
+            if data is None:
+                print(f"No data stored for node: {node_name}")
                 return '', 404
+            print(f"Successfully loaded data: {data}")
+            return jsonify(data)
                 
         elif request.method == 'POST':
             data = request.get_json()
             print(f"Received POST data: {data}")
             
-            # Write data atomically
-            atomic_write_json(data_path, data)
-            print(f"Successfully saved data to: {data_path}")
+            store.write_batch([(node_name, data, None, None, False)])
+            print(f"Successfully saved data for node: {node_name}")
             return '', 200
             
     except json.JSONDecodeError as e:
@@ -128,14 +107,10 @@ def delete_node_data(node_name):
     """Delete node data and files"""
     try:
         print(f"\n=== Handling DELETE request for node: {node_name} ===")
-        node_data_dir = os.path.join(DATA_DIR, node_name)
         node_files_dir = os.path.join(DATA_DIR, FILES_DIR, node_name)
         
-        # Delete data.json if it exists
-        data_path = os.path.join(node_data_dir, 'data.json')
-        if os.path.exists(data_path):
-            print(f"Deleting data file: {data_path}")
-            os.remove(data_path)
+        print(f"Deleting stored data for node: {node_name}")
+        get_node_store().delete(node_name)
         
         # Delete files directory if it exists
         if os.path.exists(node_files_dir):
@@ -146,11 +121,6 @@ def delete_node_data(node_name):
                 os.remove(file_path)
             os.rmdir(node_files_dir)
         
-        # Delete node directory if empty
-        if os.path.exists(node_data_dir) and not os.listdir(node_data_dir):
-            print(f"Deleting empty node directory: {node_data_dir}")
-            os.rmdir(node_data_dir)
-        
         return '', 200
     except Exception as e:
         error_msg = f"Error deleting data: {str(e)}"
@@ -164,7 +134,7 @@ def save_node_file(node_name):
         print(f"\n=== Handling POST request for file from node: {node_name} ===")
         print(f"Current working directory: {os.getcwd()}")
         
-        _, node_files_dir = ensure_dirs(node_name)
+        node_files_dir = ensure_dirs(node_name)
         
         if 'file' not in request.files:
             print("No file provided in request")
@@ -112,6 +112,8 @@ const ImageGenerator = ({ nodeId, nodeData }) => {
         },
         body: JSON.stringify({
           prompts: prompts,
+          // Reuse earlier images for unchanged prompts only when the node caches
+          cache: currentNode?.data?.cache === true,
         }),
       });
 
@@ -35,6 +35,22 @@ class DataService {
         }
     }
 
+    async patchNodeData(nodeName: string, patch: Partial<NodePersistentData> | object[]): Promise<void> {
+        // A list is an RFC 6902 JSON patch, an object an RFC 7386 merge patch
+        const contentType = Array.isArray(patch) ? 'application/json-patch+json' : 'application/merge-patch+json';
+        const response = await fetch(`${this.baseUrl}/node/${nodeName}/data`, {
+            method: 'PATCH',
+            headers: {
+                'Content-Type': contentType,
+            },
+            body: JSON.stringify(patch)
+        });
+
+        if (!response.ok) {
+            throw new Error(`Failed to patch node data: ${response.statusText}`);
+        }
+    }
+
     async loadNodeData(nodeName: string): Promise<NodePersistentData | null> {
         try {
             const response = await fetch(`${this.baseUrl}/node/${nodeName}/data`);
@@ -51,6 +67,23 @@ class DataService {
         }
     }
 
+    async loadNodesData(nodeNames: string[]): Promise<{ [nodeName: string]: NodePersistentData }> {
+        if (nodeNames.length === 0) {
+            return {};
+        }
+        try {
+            const query = nodeNames.map(name => `names=${encodeURIComponent(name)}`).join('&');
+            const response = await fetch(`${this.baseUrl}/nodes/data?${query}`);
+            if (response.ok) {
+                return await response.json();
+            }
+            throw new Error(`Failed to load nodes data: ${response.statusText}`);
+        } catch (error) {
+            console.error('Error loading data for nodes:', nodeNames, error);
+            return {};
+        }
+    }
+
     async deleteNodeData(nodeName: string): Promise<void> {
         const response = await fetch(`${this.baseUrl}/node/${nodeName}/data`, {
             method: 'DELETE'
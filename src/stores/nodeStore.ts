@@ -388,10 +388,9 @@ export const useNodeState = createWithEqualityFn<NodeState>((set, get) => ({
             });
 
             // Save source node data and all connected target nodes' data
-            await get().saveNodeData(nodeId);
-            for (const conn of connections) {
-                await get().saveNodeData(conn.targetId);
-            }
+            await Promise.all(
+                [nodeId, ...connections.map(conn => conn.targetId)].map(id => get().saveNodeData(id))
+            );
         } else {
             // If no connections, just save the source node
             await get().saveNodeData(nodeId);
@@ -596,7 +595,12 @@ export const useNodeState = createWithEqualityFn<NodeState>((set, get) => ({
         // Get existing nodes to preserve their data
         const existingNodes = get().nodes;
 
-        // Load persisted data for all nodes before adding them
+        // Load persisted data for all new nodes in a single request before adding them
+        const persistedData = await dataService.loadNodesData(
+            customComponents
+                .filter(node => !existingNodes.some(n => n.id === node.id))
+                .map(node => node.id)
+        );
         const nodesWithData = await Promise.all(customComponents.map(async (node) => {
             // Check if we have an existing node with this ID
             const existingNode = existingNodes.find(n => n.id === node.id);
@@ -606,8 +610,8 @@ export const useNodeState = createWithEqualityFn<NodeState>((set, get) => ({
             }
 
             try {
-                const nodeData = await dataService.loadNodeData(node.id);
-                if (nodeData) {
+                const nodeData = persistedData[node.id];
+                if (nodeData?.params) {
                     const updatedParams = Object.fromEntries(
                         Object.entries(node.data.params).map(([key, param]) => {
                             const paramValue = nodeData.params[key];
@@ -717,23 +721,20 @@ export const useNodeState = createWithEqualityFn<NodeState>((set, get) => ({
         const node = get().nodes.find(n => n.id === nodeId);
         if (node) {
             try {
-                // Load existing data to preserve files field
-                const existingData = await dataService.loadNodeData(nodeId);
-                
-                const data = {
-                    params: Object.fromEntries(
-                        Object.entries(node.data.params).map(([key, param]) => [
-                            key,
-                            param.value
-                        ])
-                    ),
-                    files: existingData?.files ?? node.data.files ?? [],
-                    cache: true,  // Always set cache to true when saving data
-                    time: node.data.time ?? 0,
-                    memory: node.data.memory ?? 0
-                };
-                
-                await dataService.saveNodeData(nodeId, data);
+                const params = Object.fromEntries(
+                    Object.entries(node.data.params).map(([key, param]) => [
+                        key,
+                        param.value
+                    ])
+                );
+
+                // A JSON patch replaces everything but the files field, which the server keeps
+                await dataService.patchNodeData(nodeId, [
+                    { op: 'add', path: '/params', value: params },
+                    { op: 'add', path: '/cache', value: true },  // Always set cache to true when saving data
+                    { op: 'add', path: '/time', value: node.data.time ?? 0 },
+                    { op: 'add', path: '/memory', value: node.data.memory ?? 0 }
+                ]);
                 
                 // Update the local node state to reflect the cache status
                 set((state: NodeState) => ({
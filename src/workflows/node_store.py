@@ -0,0 +1,440 @@
+"""Node data persistence shared by the workflows server and the Flask node data server.
+
+Holds the JSON patch implementation, the per-node file layout and the
+SQLite store, so both servers read, patch and migrate node data the same
+way. Nothing here depends on FastAPI or the model pipelines.
+"""
+import os
+import json
+import copy
+import hashlib
+import sqlite3
+import datetime
+import threading
+import time
+from typing import List
+
+NODE_DATA_FILE = 'data.json'
+NODE_LOG_FILE = 'data.log'
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def write_node_batch(items):
+    """Persist a batch of (node_dir, data, patches, base_hash, new_log) items.
+
+    Items with patches=None are written in full to data.json and any patch
+    log is discarded. Other items have their patches appended to data.log,
+    which is started with a header naming the data.json it applies to when
+    new_log is set. All files are written first and fsynced together before
+    any rename, so a batch costs one round of fsyncs instead of one per
+    file. Only the node cache flusher writes node files in this process, so
+    no lock files are needed.
+
+    Returns a (base_hash, log_bytes) pair per item.
+    """
+    pending = []
+    results = []
+    try:
+        for node_dir, data, patches, base_hash, new_log in items:
+            os.makedirs(node_dir, exist_ok=True)
+            if patches is None:
+                text = json.dumps(data, indent=2)
+                temp_path = os.path.join(node_dir, NODE_DATA_FILE + '.tmp')
+                f = open(temp_path, 'w')
+                pending.append((f, temp_path, node_dir))
+                f.write(text)
+                results.append((content_hash(text), 0))
+            else:
+                lines = [json.dumps({"base": base_hash})] if new_log else []
+                lines += [json.dumps(patch, separators=(',', ':')) for patch in patches]
+                text = '\n'.join(lines) + '\n'
+                f = open(os.path.join(node_dir, NODE_LOG_FILE), 'w' if new_log else 'a')
+                pending.append((f, None, node_dir))
+                f.write(text)
+                results.append((base_hash, len(text)))
+            f.flush()
+
+        for f, _, _ in pending:
+            os.fsync(f.fileno())
+
+        for f, temp_path, node_dir in pending:
+            f.close()
+            if temp_path is not None:
+                os.replace(temp_path, os.path.join(node_dir, NODE_DATA_FILE))
+                # A log left behind by a crash here is ignored on load: its header no longer matches
+                log_path = os.path.join(node_dir, NODE_LOG_FILE)
+                if os.path.exists(log_path):
+                    os.remove(log_path)
+    finally:
+        # Clean up anything left behind by a failed batch
+        for f, temp_path, _ in pending:
+            f.close()
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+    return results
+
+def read_node_data(node_dir):
+    """Read a node's data.json and replay its patch log.
+
+    Returns (data, size, base_hash, log_entries, log_bytes). A missing or
+    invalid data.json reads as {} with no base_hash. Log entries are only
+    replayed when the log header matches the current data.json; replay
+    stops at the first unreadable entry, e.g. one torn by a crash.
+    """
+    try:
+        with open(os.path.join(node_dir, NODE_DATA_FILE), 'r') as f:
+            text = f.read()
+        data, size, base_hash = json.loads(text), len(text), content_hash(text)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}, 2, None, 0, 0
+
+    log_entries = log_bytes = 0
+    try:
+        with open(os.path.join(node_dir, NODE_LOG_FILE), 'r') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        lines = []
+    try:
+        if lines and json.loads(lines[0]).get("base") == base_hash:
+            log_bytes = len(lines[0]) + 1
+            for line in lines[1:]:
+                data = apply_patch(data, json.loads(line))
+                log_entries += 1
+                log_bytes += len(line) + 1
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Stopped replaying patch log in {node_dir}: {str(e)}")
+    return data, size + log_bytes, base_hash, log_entries, log_bytes
+
+class PatchError(ValueError):
+    """Raised when a JSON patch is malformed or cannot be applied"""
+
+def apply_merge_patch(target, patch):
+    """Apply an RFC 7386 JSON merge patch, returning a new document.
+
+    Unchanged subtrees are shared with the target, which is never mutated.
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+def _parse_pointer(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+def _child_key(container, token: str, allow_end: bool = False):
+    if isinstance(container, dict):
+        return token
+    if isinstance(container, list):
+        if allow_end and token == '-':
+            return len(container)
+        if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+            raise PatchError(f"Invalid array index: {token!r}")
+        index = int(token)
+        if index > len(container) or (index == len(container) and not allow_end):
+            raise PatchError(f"Array index out of range: {token}")
+        return index
+    raise PatchError(f"Cannot index into {type(container).__name__} with {token!r}")
+
+def _get_pointer(doc, tokens):
+    for token in tokens:
+        key = _child_key(doc, token)
+        if isinstance(doc, dict) and key not in doc:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+        doc = doc[key]
+    return doc
+
+def _copy_to_parent(doc, tokens):
+    """Shallow-copy every container from the root down to the parent of tokens.
+
+    Returns (new_root, parent) so the parent can be modified without
+    touching the original document.
+    """
+    root = copy.copy(doc)
+    parent = root
+    for token in tokens[:-1]:
+        key = _child_key(parent, token)
+        if isinstance(parent, dict) and key not in parent:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+        child = copy.copy(parent[key])
+        parent[key] = child
+        parent = child
+    return root, parent
+
+def _add(doc, tokens, value):
+    if not tokens:
+        return value
+    root, parent = _copy_to_parent(doc, tokens)
+    key = _child_key(parent, tokens[-1], allow_end=True)
+    if isinstance(parent, list):
+        parent.insert(key, value)
+    else:
+        parent[key] = value
+    return root
+
+def _remove(doc, tokens):
+    if not tokens:
+        raise PatchError("Cannot remove the document root")
+    root, parent = _copy_to_parent(doc, tokens)
+    key = _child_key(parent, tokens[-1])
+    if isinstance(parent, dict) and key not in parent:
+        raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+    del parent[key]
+    return root
+
+def apply_json_patch(doc, operations):
+    """Apply an RFC 6902 JSON patch, returning a new document.
+
+    Containers along each modified path are copied, so the original document
+    is never mutated and unchanged subtrees are shared.
+    """
+    if not isinstance(operations, list):
+        raise PatchError("JSON patch must be a list of operations")
+    for operation in operations:
+        if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+            raise PatchError(f"Invalid patch operation: {operation!r}")
+        op = operation['op']
+        tokens = _parse_pointer(operation['path'])
+        if op in ('add', 'replace', 'test') and 'value' not in operation:
+            raise PatchError(f"'{op}' operation requires a value")
+        if op == 'add':
+            doc = _add(doc, tokens, operation['value'])
+        elif op == 'remove':
+            doc = _remove(doc, tokens)
+        elif op == 'replace':
+            _get_pointer(doc, tokens)
+            doc = _add(_remove(doc, tokens), tokens, operation['value']) if tokens else operation['value']
+        elif op == 'move':
+            from_tokens = _parse_pointer(operation.get('from'))
+            if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                raise PatchError("Cannot move a value into one of its children")
+            value = _get_pointer(doc, from_tokens)
+            doc = _add(_remove(doc, from_tokens), tokens, value)
+        elif op == 'copy':
+            value = _get_pointer(doc, _parse_pointer(operation.get('from')))
+            doc = _add(doc, tokens, copy.deepcopy(value))
+        elif op == 'test':
+            if _get_pointer(doc, tokens) != operation['value']:
+                raise PatchError(f"Test failed at {operation['path']}")
+        else:
+            raise PatchError(f"Unknown patch operation: {op!r}")
+    return doc
+
+def apply_patch(doc, patch: dict):
+    """Apply a logged patch of the form {"type": "json" | "merge", "patch": ...}"""
+    if patch.get("type") == "json":
+        return apply_json_patch(doc, patch["patch"])
+    return apply_merge_patch(doc, patch["patch"])
+
+# Node data storage backends. A store's methods are blocking and run on the
+# node I/O executor; write batches are serialized by the caller.
+class NodeStore:
+    """Interface for persisting node data documents and their patch logs"""
+
+    def load(self, node_name: str):
+        """Return (data, size, base_hash, log_entries, log_bytes) for a node.
+
+        A node that does not exist loads as {} with no base_hash.
+        """
+        raise NotImplementedError
+
+    def write_batch(self, items):
+        """Persist (node_name, data, patches, base_hash, new_log) items atomically.
+
+        Items with patches=None replace the stored document and drop its
+        patch log; others append their patches to it. Returns a
+        (base_hash, bytes_written) pair per item.
+        """
+        raise NotImplementedError
+
+    def delete(self, node_name: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class FileNodeStore(NodeStore):
+    """One directory per node holding data.json and its data.log patch log"""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+
+    def load(self, node_name: str):
+        return read_node_data(os.path.join(self.data_dir, node_name))
+
+    def write_batch(self, items):
+        return write_node_batch([
+            (os.path.join(self.data_dir, node_name), data, patches, base_hash, new_log)
+            for node_name, data, patches, base_hash, new_log in items
+        ])
+
+    def delete(self, node_name: str):
+        node_dir = os.path.join(self.data_dir, node_name)
+        for filename in (NODE_DATA_FILE, NODE_LOG_FILE):
+            data_path = os.path.join(node_dir, filename)
+            if os.path.exists(data_path):
+                os.remove(data_path)
+
+        # Delete node directory if empty
+        if os.path.exists(node_dir) and not os.listdir(node_dir):
+            os.rmdir(node_dir)
+
+class SQLiteNodeStore(NodeStore):
+    """All node data in a single SQLite database in WAL mode.
+
+    Documents live in the nodes table and patches in node_patches, so each
+    write batch is one transaction and one WAL fsync. Every executor thread
+    gets its own connection; WAL lets readers proceed while a batch commits.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS nodes (
+            name TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            updated REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS node_patches (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            patch TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS node_patches_name ON node_patches (name, seq);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # FULL keeps the fsync-per-write durability of the file layout, once per batch
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def load(self, node_name: str):
+        conn = self._conn()
+        row = conn.execute("SELECT data, hash FROM nodes WHERE name = ?", (node_name,)).fetchone()
+        if row is None:
+            return {}, 2, None, 0, 0
+        text, base_hash = row
+        data = json.loads(text)
+        log_entries = log_bytes = 0
+        for (patch_text,) in conn.execute(
+            "SELECT patch FROM node_patches WHERE name = ? ORDER BY seq", (node_name,)
+        ):
+            data = apply_patch(data, json.loads(patch_text))
+            log_entries += 1
+            log_bytes += len(patch_text)
+        return data, len(text) + log_bytes, base_hash, log_entries, log_bytes
+
+    def write_batch(self, items):
+        conn = self._conn()
+        results = []
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for node_name, data, patches, base_hash, _ in items:
+                if patches is None:
+                    text = json.dumps(data, separators=(',', ':'))
+                    base_hash = content_hash(text)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO nodes (name, data, hash, updated) VALUES (?, ?, ?, ?)",
+                        (node_name, text, base_hash, now),
+                    )
+                    conn.execute("DELETE FROM node_patches WHERE name = ?", (node_name,))
+                    results.append((base_hash, len(text)))
+                else:
+                    rows = [(node_name, json.dumps(patch, separators=(',', ':'))) for patch in patches]
+                    conn.executemany("INSERT INTO node_patches (name, patch) VALUES (?, ?)", rows)
+                    conn.execute("UPDATE nodes SET updated = ? WHERE name = ?", (now, node_name))
+                    results.append((base_hash, sum(len(patch_text) for _, patch_text in rows)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return results
+
+    def delete(self, node_name: str):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM nodes WHERE name = ?", (node_name,))
+            conn.execute("DELETE FROM node_patches WHERE name = ?", (node_name,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def migrate_from_files(self, data_dir: str) -> int:
+        """Import nodes from the per-node directory layout, once.
+
+        Patch logs are replayed before import. The old files are left in
+        place so the migration can be checked and rolled back by hand.
+        """
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'files_migrated'").fetchone():
+            return 0
+
+        items = []
+        if os.path.isdir(data_dir):
+            for node_name in sorted(os.listdir(data_dir)):
+                node_dir = os.path.join(data_dir, node_name)
+                if not os.path.isfile(os.path.join(node_dir, NODE_DATA_FILE)):
+                    continue
+                data, _, base_hash, _, _ = read_node_data(node_dir)
+                if base_hash is not None:
+                    items.append((node_name, data, None, None, False))
+
+        # Nodes already in the database are newer than the files they came from
+        existing = {name for (name,) in conn.execute("SELECT name FROM nodes")}
+        self.write_batch([item for item in items if item[0] not in existing])
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('files_migrated', ?)",
+            (datetime.datetime.now().isoformat(),),
+        )
+        if items:
+            print(f"Migrated {len(items)} node(s) from {data_dir} into {self.db_path}; "
+                  f"the old node directories are no longer used and can be removed")
+        return len(items)
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+def create_node_store(data_dir: str) -> NodeStore:
+    """Create the node store for data_dir selected by NODE_STORE ('sqlite' or 'files')"""
+    backend = os.getenv('NODE_STORE', 'sqlite')
+    if backend == 'files':
+        return FileNodeStore(data_dir)
+    if backend == 'sqlite':
+        store = SQLiteNodeStore(os.path.join(data_dir, 'nodes.db'))
+        store.migrate_from_files(data_dir)
+        return store
+    raise ValueError(f"Unknown NODE_STORE backend: {backend}")
@@ -1,21 +1,38 @@
 import os
 import time
-import requests
+import httpx
 import uvicorn
 import json
-import fcntl
+import math
+import copy
+import hashlib
+import threading
+import queue
+import shutil
+import subprocess
+import tempfile
+import uuid
+import random
 import psutil
 import datetime
+import email.utils
 import anthropic
-from typing import Dict, Optional, List, Tuple
+from typing import Callable, Dict, Optional, List, Tuple
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import asyncio
+import contextlib
+import bisect
+from collections import OrderedDict, defaultdict, deque
+import concurrent.futures
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
+from node_store import PatchError, apply_patch, NodeStore, FileNodeStore, SQLiteNodeStore, create_node_store
 
 # New imports for FLUX interpolation
 import torch
@@ -23,14 +40,24 @@ import gc
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-from torch.cuda import max_memory_allocated, reset_peak_memory_stats, synchronize
+from torch.cuda import max_memory_allocated, reset_peak_memory_stats
 from diffusers import FlowMatchEulerDiscreteScheduler, AutoencoderKL, FluxPriorReduxPipeline, FluxImg2ImgPipeline
 from diffusers.models.transformers.transformer_flux import FluxTransformer2DModel
 from diffusers.pipelines.flux.pipeline_flux import FluxPipeline
 from diffusers.utils import load_image
+from safetensors import safe_open
+from safetensors.torch import save_file as save_safetensors
 from transformers import CLIPTextModel, CLIPTokenizer, T5EncoderModel, T5TokenizerFast
 from functools import wraps
 import glob
+import itertools
+import inspect
+
+# Optional: quantizes the LoRA pipeline's transformer to float8
+try:
+    from optimum.quanto import freeze, qfloat8, quantize
+except ImportError:
+    quantize = None
 
 # Load environment variables
 load_dotenv()
@@ -51,15 +78,85 @@ app.add_middleware(
 DATA_DIR = 'data'
 FILES_DIR = os.path.join(DATA_DIR, 'files')  # All files go directly in data/files
 
+# Model locations for interpolation; point these at tiny models to run on CPU
+FLUX_REPO = os.getenv('FLUX_REPO', 'black-forest-labs/FLUX.1-schnell')
+FLUX_REVISION = os.getenv('FLUX_REVISION', 'refs/pr/1') or None
+CLIP_REPO = os.getenv('CLIP_REPO', 'openai/clip-vit-large-patch14')
+REDUX_REPO = os.getenv('REDUX_REPO', 'black-forest-labs/FLUX.1-Redux-dev')
+REDUX_REVISION = os.getenv('REDUX_REVISION') or None
+# Redux image embeddings, keyed by image content hash and REDUX_REPO/REDUX_REVISION
+EMBEDDINGS_DIR = os.path.join(DATA_DIR, 'embeddings')
+# Checkpointed frames of unfinished interpolation renders; checkpoints left
+# untouched for RENDER_CHECKPOINT_MAX_AGE_HOURS are removed
+RENDERS_DIR = os.path.join(DATA_DIR, 'renders')
+RENDER_CHECKPOINT_MAX_AGE_HOURS = float(os.getenv('RENDER_CHECKPOINT_MAX_AGE_HOURS', '48'))
+# Rendered transitions, cached as clips and stitched into videos
+SEGMENTS_DIR = os.path.join(DATA_DIR, 'segments')
+SEGMENT_CACHE_MAX_MB = int(os.getenv('SEGMENT_CACHE_MAX_MB', '4096'))
+# fal.ai generation API; point FAL_API_URL at a local mock server to test without the service
+FAL_API_URL = os.getenv('FAL_API_URL', 'https://fal.run').rstrip('/')
+FAL_CONNECT_TIMEOUT = float(os.getenv('FAL_CONNECT_TIMEOUT', '10'))
+FAL_READ_TIMEOUT = float(os.getenv('FAL_READ_TIMEOUT', '120'))
+FAL_MAX_CONNECTIONS = int(os.getenv('FAL_MAX_CONNECTIONS', '20'))
+FAL_KEEPALIVE_CONNECTIONS = int(os.getenv('FAL_KEEPALIVE_CONNECTIONS', '10'))
+# fal.ai rate limit: requests per second, burst size and concurrent requests;
+# 429 and 5xx responses are retried up to FAL_MAX_RETRIES times with backoff
+FAL_RATE_LIMIT = float(os.getenv('FAL_RATE_LIMIT', '2'))
+FAL_RATE_BURST = int(os.getenv('FAL_RATE_BURST', '4'))
+FAL_MAX_IN_FLIGHT = int(os.getenv('FAL_MAX_IN_FLIGHT', '4'))
+FAL_MAX_RETRIES = int(os.getenv('FAL_MAX_RETRIES', '4'))
+# Longest Retry-After honoured, in seconds; longer waits are capped
+FAL_MAX_RETRY_AFTER = float(os.getenv('FAL_MAX_RETRY_AFTER', '60'))
+# Identical generation payloads reuse earlier images for GENERATION_CACHE_TTL seconds.
+# Unseeded requests give a new image every time on fal.ai, so they are only
+# reused when the request sets cache=true
+GENERATION_CACHE_TTL = float(os.getenv('GENERATION_CACHE_TTL', str(24 * 3600)))
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv('GENERATION_CACHE_MAX_ENTRIES', '1000'))
+# Preview profile: generation size, denoising steps and every how many frames a keyframe is generated
+PREVIEW_SIZE = int(os.getenv('PREVIEW_SIZE', '256'))
+PREVIEW_STEPS = int(os.getenv('PREVIEW_STEPS', '2'))
+PREVIEW_KEYFRAME_STRIDE = int(os.getenv('PREVIEW_KEYFRAME_STRIDE', '4'))
+# Worker processes, each with its own pipelines, that render independent segments (0 = in-process)
+RENDER_SHARDS = int(os.getenv('RENDER_SHARDS', '0'))
+# Resident pipelines are released least recently used first above this budget (0 = unlimited)
+PIPELINE_MEMORY_BUDGET_GB = float(os.getenv('PIPELINE_MEMORY_BUDGET_GB', '0'))
+# Comma-separated pipelines to load at startup, e.g. "flux,redux"; "lora" starts the LoRA worker
+PIPELINE_WARMUP = [name for name in os.getenv('PIPELINE_WARMUP', '').split(',') if name]
+# FLUX LoRA worker: base model, LoRA weights (empty to skip) and fuse scale; point
+# LORA_BASE_MODEL at a tiny local pipeline to run on CPU
+LORA_BASE_MODEL = os.getenv('LORA_BASE_MODEL', 'black-forest-labs/FLUX.1-schnell')
+LORA_WEIGHTS = os.getenv('LORA_WEIGHTS', './flux_tarot_v1_lora.safetensors')
+# SimpleTuner fixes the LoRA alpha to 16, hence the default scale
+LORA_SCALE = float(os.getenv('LORA_SCALE', '0.125'))
+LORA_QUANTIZE = os.getenv('LORA_QUANTIZE', '1') != '0'
+# Concurrent /generate-lora requests of the same size are run as one batch
+LORA_MAX_BATCH = int(os.getenv('LORA_MAX_BATCH', '4'))
+LORA_BATCH_WINDOW_MS = float(os.getenv('LORA_BATCH_WINDOW_MS', '20'))
+# Frames denoised per pipeline call; 0 sizes micro-batches from available memory
+INTERPOLATION_BATCH_SIZE = int(os.getenv('INTERPOLATION_BATCH_SIZE', '0'))
+MAX_MICRO_BATCH_SIZE = 16
+# Rough activation memory per output pixel for one frame in a batch
+FRAME_BYTES_PER_PIXEL = 4096
+# Decoded input images held ahead of the Redux encoder
+IMAGE_PREFETCH = int(os.getenv('IMAGE_PREFETCH', '8'))
+# Interpolation renders that may run at the same time
+RENDER_CONCURRENCY = int(os.getenv('RENDER_CONCURRENCY', '2'))
+
 # Keep existing models
 class GenerateRequest(BaseModel):
     prompt: str
     prompt_num: int
     fal_key: Optional[str] = None
+    seed: Optional[int] = None
+    # None reuses seeded generations only, True unseeded ones too, False never
+    cache: Optional[bool] = None
 
 class BatchGenerateRequest(BaseModel):
     prompts: Dict[int, str]
     fal_key: Optional[str] = None
+    seed: Optional[int] = None
+    # None reuses seeded generations only, True unseeded ones too, False never
+    cache: Optional[bool] = None
 
 # Add new models for Claude API
 class PromptGenerateRequest(BaseModel):
@@ -79,6 +176,17 @@ class InterpolationRequest(BaseModel):
     timestamps: Optional[List[float]] = None
     fps: float = 30.0
     denoised_image: Optional[float] = None
+    batch_size: Optional[int] = None
+    easing: str = "slerp"
+    save_frames: bool = False
+    resume: bool = True
+    segment_cache: bool = True
+    # Preview renders fill in the defaults of size, steps and keyframe_stride
+    # from the PREVIEW_* settings; "promote" the job for the full-quality render
+    preview: bool = False
+    size: Optional[int] = None
+    num_inference_steps: Optional[int] = None
+    keyframe_stride: Optional[int] = None
 
 # Add model for FLUX Lora generation
 class FluxLoraRequest(BaseModel):
@@ -90,38 +198,11 @@ class FluxLoraRequest(BaseModel):
     seed: Optional[int] = None
     timestep_to_start_cfg: int = 2
 
-# Node data helper functions
-def atomic_write_json(data_path, data):
-    """Write data to a file atomically using a lock file"""
-    lock_path = data_path + '.lock'
-    temp_path = data_path + '.tmp'
-    
-    try:
-        # Ensure parent directory exists
-        os.makedirs(os.path.dirname(data_path), exist_ok=True)
-        
-        # Create lock file
-        with open(lock_path, 'w') as lock_file:
-            # Get exclusive lock
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
-            try:
-                # Write to temp file
-                with open(temp_path, 'w') as f:
-                    json.dump(data, f, indent=2)
-                    f.flush()
-                    os.fsync(f.fileno())
-                
-                # Atomic rename
-                os.replace(temp_path, data_path)
-            finally:
-                # Release lock
-                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
-    finally:
-        # Clean up
-        if os.path.exists(lock_path):
-            os.remove(lock_path)
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+# Bounded thread pool for node data disk I/O so it never blocks the event loop
+node_io_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('NODE_IO_WORKERS', '4')),
+    thread_name_prefix='node-io',
+)
 
 def ensure_dirs():
     """Ensure the data and files directories exist"""
@@ -144,125 +225,528 @@ async def test():
     """Test endpoint to verify server is working"""
     return {"status": "ok", "message": "Server is running"}
 
+# Process-wide metrics. Everything here is O(1) per update and never touches
+# /proc on a request path; process memory is sampled by a background task.
+METRICS_SAMPLE_INTERVAL = float(os.getenv('METRICS_SAMPLE_INTERVAL', '5'))
+DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum and max"""
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+class Metrics:
+    """Registry of counters, gauges and histograms"""
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+        }
+
+    def render_prometheus(self, extra_gauges: Optional[dict] = None) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+        for name, value in sorted({**self.gauges, **(extra_gauges or {})}.items()):
+            lines += [f"# TYPE {name} gauge", f"{name} {float(value)}"]
+        for name, h in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip([str(b) for b in h.buckets] + ["+Inf"], h.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{name}_sum {h.sum}", f"{name}_count {h.count}"]
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+_process = psutil.Process(os.getpid())
+
 def get_process_memory():
-    """Get current process memory usage in MB"""
-    process = psutil.Process(os.getpid())
-    return process.memory_info().rss / 1024 / 1024
+    """Get current process memory usage in MB. Reads /proc, so keep it off hot paths"""
+    return _process.memory_info().rss / 1024 / 1024
 
-def log_performance(message: str, memory_before: float = None):
-    """Log a performance message with timestamp and memory usage"""
+def sample_process_memory():
+    """Record current and peak process memory as gauges"""
     current_memory = get_process_memory()
-    timestamp = datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3]
-    memory_diff = f"(Δ: {current_memory - memory_before:.1f}MB)" if memory_before is not None else ""
-    print(f"[{timestamp}] {message} - Memory: {current_memory:.1f}MB {memory_diff}")
+    metrics.set_gauge("process_rss_mb", current_memory)
+    metrics.set_gauge("process_peak_rss_mb", max(metrics.gauges.get("process_peak_rss_mb", 0.0), current_memory))
     return current_memory
 
+async def memory_sampler_loop(interval: float = METRICS_SAMPLE_INTERVAL):
+    """Periodically sample process memory for the metrics registry"""
+    while True:
+        sample_process_memory()
+        await asyncio.sleep(interval)
+
+def log_performance(message: str):
+    """Log a performance message with timestamp and last sampled memory usage"""
+    current_memory = metrics.gauges.get("process_rss_mb", 0.0)
+    timestamp = datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3]
+    print(f"[{timestamp}] {message} - Memory: {current_memory:.1f}MB")
+
+def json_size(data) -> int:
+    """Approximate in-memory footprint of a JSON document by its compact serialized size"""
+    return len(json.dumps(data, separators=(',', ':')))
+
 class NodeCache:
-    def __init__(self, write_delay=5):
-        self.cache = {}
+    def __init__(self, store: NodeStore, write_delay=5, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, compact_entries: int = 100):
+        self.store = store
+        # Ordered by recency: the least recently used node is first
+        self.cache = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
         self.last_write = {}
         self.dirty = set()
+        self.dirty_since = {}
+        # Nodes whose data is currently being written by the I/O executor
+        self.writing = set()
+        # Dirty nodes to write without waiting for write_delay (eviction, bulk saves)
+        self.flush_asap = set()
+        # Nodes whose last write failed are not retried before this time
+        self.retry_at = {}
+        # Patches applied since the last flush. A dirty node without an entry
+        # here needs its whole data.json rewritten.
+        self.pending_patches = {}
+        # Per-node patch log state: hash of the data.json the log applies to,
+        # and how many entries and bytes it holds
+        self.base_hash = {}
+        self.log_entries = {}
+        self.log_bytes = {}
+        self.compact_entries = compact_entries
         self.write_delay = write_delay
+        # Guards cache bookkeeping only; disk I/O never runs under it
         self.lock = asyncio.Lock()
+        # Serializes write batches so writes of the same node cannot reorder
+        self.write_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._flusher_task = None
         self.stats = {
             "total_writes": 0,
             "total_bytes_written": 0,
             "cache_hits": 0,
             "cache_misses": 0,
-            "peak_memory": 0,
+            "flush_batches": 0,
+            "flush_errors": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "max_flush_lag_s": 0.0,
+            "evictions": 0,
+            "patches_applied": 0,
+            "log_appends": 0,
+            "compactions": 0,
         }
         log_performance("Initialized NodeCache")
 
+    def start(self):
+        """Start the background write-behind flusher on the running loop"""
+        if self._flusher_task is None or self._flusher_task.done():
+            self._stopping = False
+            self._flusher_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the background flusher and write out everything still dirty"""
+        if self._flusher_task is not None:
+            # Let the flusher finish its current batch rather than cancelling mid-write
+            self._stopping = True
+            self._wakeup.set()
+            await self._flusher_task
+            self._flusher_task = None
+        await self.flush_all()
+        await asyncio.get_running_loop().run_in_executor(node_io_executor, self.store.close)
+
+    def _flush_deadline(self, node_name: str) -> float:
+        # A failed write is retried after write_delay, even for nodes wanted as soon as possible
+        retry_at = self.retry_at.get(node_name, 0)
+        if node_name in self.flush_asap:
+            return retry_at
+        # A node is written at most once per write_delay; the first write is immediate
+        return max(self.last_write.get(node_name, 0) + self.write_delay, retry_at)
+
+    async def _flush_loop(self):
+        """Coalesce dirty nodes and write them out once their deadline passes"""
+        while not self._stopping:
+            self._wakeup.clear()
+            now = time.time()
+            due = [name for name in self.dirty if self._flush_deadline(name) <= now]
+            if due:
+                await self.flush_nodes(due)
+                continue
+
+            timeout = None
+            if self.dirty:
+                timeout = max(0.0, min(self._flush_deadline(name) for name in self.dirty) - now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def flush_nodes(self, node_names):
+        """Write a batch of dirty nodes to disk on the I/O executor.
+
+        Cache entries are replaced on update, never mutated in place, so the
+        snapshot taken here can be serialized off the event loop without
+        copying. Nodes changed only by patches get those patches appended to
+        their log; the log is compacted into a full data.json rewrite once it
+        holds compact_entries entries or outgrows the document. Nodes that
+        fail to write are marked dirty again and retried after write_delay
+        with a full rewrite.
+        """
+        async with self.write_lock:
+            async with self.lock:
+                batch = []
+                for node_name in node_names:
+                    if node_name not in self.dirty:
+                        continue
+                    self.dirty.remove(node_name)
+                    self.writing.add(node_name)
+                    patches = self.pending_patches.pop(node_name, None)
+                    base_hash = self.base_hash.get(node_name)
+                    log_entries = self.log_entries.get(node_name, 0)
+                    if (patches is not None and base_hash is not None
+                            and log_entries + len(patches) <= self.compact_entries
+                            and self.log_bytes.get(node_name, 0) <= max(self.sizes[node_name], 4096)):
+                        new_log = log_entries == 0
+                    else:
+                        patches, new_log = None, False
+                    batch.append((
+                        node_name,
+                        self.cache[node_name],
+                        self.sizes[node_name],
+                        self.dirty_since.pop(node_name, time.time()),
+                        patches,
+                        base_hash,
+                        new_log,
+                    ))
+            if not batch:
+                return
+
+            start_time = time.time()
+            try:
+                items = [
+                    (name, data, patches, base_hash, new_log)
+                    for name, data, _, _, patches, base_hash, new_log in batch
+                ]
+                results = await asyncio.get_running_loop().run_in_executor(node_io_executor, self.store.write_batch, items)
+            except Exception as e:
+                async with self.lock:
+                    for node_name, _, _, dirty_since, _, _, _ in batch:
+                        self.writing.discard(node_name)
+                        self.last_write[node_name] = time.time()
+                        self.retry_at[node_name] = time.time() + self.write_delay
+                        self.pending_patches.pop(node_name, None)
+                        if node_name in self.cache and node_name not in self.dirty:
+                            self.dirty.add(node_name)
+                            self.dirty_since[node_name] = dirty_since
+                self.stats["flush_errors"] += 1
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                print(f"Error flushing {len(batch)} node(s): {detail}")
+                return
+
+            finished = time.time()
+            batch_bytes = 0
+            for (node_name, _, data_size, dirty_since, patches, _, _), (base_hash, log_bytes) in zip(batch, results):
+                self.writing.discard(node_name)
+                self.flush_asap.discard(node_name)
+                self.retry_at.pop(node_name, None)
+                self.last_write[node_name] = finished
+                self.stats["max_flush_lag_s"] = max(self.stats["max_flush_lag_s"], finished - dirty_since)
+                self.base_hash[node_name] = base_hash
+                if patches is None:
+                    if self.log_entries.get(node_name):
+                        self.stats["compactions"] += 1
+                    self.log_entries[node_name] = 0
+                    self.log_bytes[node_name] = 0
+                    batch_bytes += data_size
+                else:
+                    self.log_entries[node_name] = self.log_entries.get(node_name, 0) + len(patches)
+                    self.log_bytes[node_name] = self.log_bytes.get(node_name, 0) + log_bytes
+                    self.stats["log_appends"] += 1
+                    batch_bytes += log_bytes
+
+            flush_ms = (finished - start_time) * 1000
+            metrics.observe("node_cache_flush_ms", flush_ms)
+            metrics.inc("node_cache_bytes_written_total", batch_bytes)
+            self.stats["total_writes"] += len(batch)
+            self.stats["total_bytes_written"] += batch_bytes
+            self.stats["flush_batches"] += 1
+            self.stats["last_flush_ms"] = flush_ms
+            self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], flush_ms)
+
+            log_performance(f"Wrote {len(batch)} node(s), {batch_bytes:,} bytes to disk in {flush_ms:.1f}ms")
+
+        # Entries written on behalf of eviction can be dropped now
+        self._evict()
+
+    async def flush(self, node_name: str):
+        await self.flush_nodes([node_name])
+
+    async def flush_all(self):
+        """Write every dirty node to disk immediately"""
+        await self.flush_nodes(list(self.dirty))
+
+    def get_stats(self) -> dict:
+        """Return cache statistics including the write-behind backlog"""
+        now = time.time()
+        oldest = min(self.dirty_since.values(), default=None)
+        return {
+            **self.stats,
+            "cached_nodes": len(self.cache),
+            "cached_bytes": self.total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "backlog": len(self.dirty),
+            "writes_in_flight": len(self.writing),
+            "oldest_dirty_age_s": now - oldest if oldest is not None else 0.0,
+            "flusher_running": self._flusher_task is not None and not self._flusher_task.done(),
+        }
+
     async def get(self, node_name: str):
-        mem_before = get_process_memory()
-        if node_name not in self.cache:
-            self.stats["cache_misses"] += 1
-            log_performance(f"Cache MISS for {node_name}", mem_before)
-            data_dir, _ = ensure_dirs()
-            data_path = os.path.join(data_dir, node_name, 'data.json')
-            if os.path.exists(data_path):
-                try:
-                    with open(data_path, 'r') as f:
-                        start_time = time.time()
-                        self.cache[node_name] = json.load(f)
-                        log_performance(f"Loaded {node_name} from disk in {(time.time() - start_time)*1000:.1f}ms")
-                except json.JSONDecodeError:
-                    self.cache[node_name] = {}
-            else:
-                self.cache[node_name] = {}
-        else:
-            self.stats["cache_hits"] += 1
-            log_performance(f"Cache HIT for {node_name}", mem_before)
-        
-        # Track peak memory
-        current_memory = get_process_memory()
-        self.stats["peak_memory"] = max(self.stats["peak_memory"], current_memory)
-        return self.cache[node_name]
+        return (await self.get_many([node_name]))[node_name]
+
+    async def get_many(self, node_names: List[str]) -> Dict[str, dict]:
+        """Get several nodes at once, loading all cache misses from the store concurrently.
+
+        Other requests can evict or delete nodes while misses are loading, so
+        every requested node is checked again afterwards and any that went
+        missing are loaded as well.
+        """
+        names = list(dict.fromkeys(node_names))
+        missed = set()
+        while True:
+            misses = [name for name in names if name not in self.cache]
+            if not misses:
+                break
+            missed.update(misses)
+            self.stats["cache_misses"] += len(misses)
+            loop = asyncio.get_running_loop()
+            start_time = time.time()
+            loaded = await asyncio.gather(*(
+                loop.run_in_executor(node_io_executor, self.store.load, node_name) for node_name in misses
+            ))
+            load_ms = (time.time() - start_time) * 1000
+            metrics.observe("node_cache_load_ms", load_ms)
+            log_performance(f"Cache MISS for {len(misses)} node(s), loaded from disk in {load_ms:.1f}ms")
+            for node_name, (data, size, base_hash, log_entries, log_bytes) in zip(misses, loaded):
+                # Another request may have stored the node while we were reading
+                if node_name not in self.cache:
+                    self._store(node_name, data, size)
+                    self.base_hash[node_name] = base_hash
+                    self.log_entries[node_name] = log_entries
+                    self.log_bytes[node_name] = log_bytes
+
+        # No awaits from here on, so every requested node is still cached
+        result = {}
+        for node_name in names:
+            if node_name not in missed:
+                self.stats["cache_hits"] += 1
+            self.cache.move_to_end(node_name)
+            result[node_name] = self.cache[node_name]
+        self._evict(keep=set(node_names))
+        return result
+
+    def _store(self, node_name: str, data: dict, size: int):
+        """Insert or replace a cache entry as most recently used, tracking its size"""
+        self.total_bytes += size - self.sizes.get(node_name, 0)
+        self.sizes[node_name] = size
+        self.cache[node_name] = data
+        self.cache.move_to_end(node_name)
+
+    def _drop(self, node_name: str):
+        """Remove a cache entry, its size accounting and its patch log state"""
+        self.cache.pop(node_name, None)
+        self.total_bytes -= self.sizes.pop(node_name, 0)
+        self.base_hash.pop(node_name, None)
+        self.log_entries.pop(node_name, None)
+        self.log_bytes.pop(node_name, None)
+
+    def _over_budget(self) -> bool:
+        if self.max_entries is not None and len(self.cache) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def _evict(self, keep=()):
+        """Evict least recently used entries until within budget.
+
+        Clean entries are dropped right away. Dirty entries and entries with
+        a write in flight are never dropped; dirty ones are handed to the
+        flusher for an immediate write and dropped once it lands.
+        """
+        if not self._over_budget():
+            return
+        needs_flush = False
+        for node_name in list(self.cache):
+            if not self._over_budget():
+                break
+            if node_name in keep or node_name in self.writing:
+                continue
+            if node_name in self.dirty:
+                self.flush_asap.add(node_name)
+                needs_flush = True
+                continue
+            self._drop(node_name)
+            self.last_write.pop(node_name, None)
+            self.flush_asap.discard(node_name)
+            self.stats["evictions"] += 1
+        if needs_flush:
+            self._wakeup.set()
 
     async def set(self, node_name: str, data: dict):
         async with self.lock:
-            mem_before = get_process_memory()
-            data_size = len(str(data))
-            log_performance(f"Setting data for {node_name} (size: {data_size:,} bytes)", mem_before)
-            
-            self.cache[node_name] = data
+            data_size = json_size(data)
+            self._store(node_name, data, data_size)
+            # A whole-document update always rewrites data.json
+            self.pending_patches.pop(node_name, None)
+            if node_name not in self.dirty:
+                self.dirty.add(node_name)
+                self.dirty_since[node_name] = time.time()
+
+            self._evict(keep={node_name})
+
+        # The background flusher owns all writes; make sure it is running and wake it
+        self.start()
+        self._wakeup.set()
+
+    async def set_many(self, nodes: Dict[str, dict]):
+        """Replace several nodes at once and have them written together in the next flush"""
+        async with self.lock:
+            now = time.time()
+            for node_name, data in nodes.items():
+                self._store(node_name, data, json_size(data))
+                self.pending_patches.pop(node_name, None)
+                self.flush_asap.add(node_name)
+                if node_name not in self.dirty:
+                    self.dirty.add(node_name)
+                    self.dirty_since[node_name] = now
+
+            self._evict(keep=set(nodes))
+
+        self.start()
+        self._wakeup.set()
+
+    async def patch(self, node_name: str, patch: dict):
+        """Apply a {"type": "json" | "merge", "patch": ...} patch to a node.
+
+        The patched document replaces the cached one and the patch is queued
+        for the node's append-only log. Raises PatchError if the patch cannot
+        be applied or would leave the node's data something other than an
+        object, leaving the node unchanged.
+        """
+        await self.get(node_name)
+        # No awaits from here on, so the node stays cached while it is patched
+        data = apply_patch(self.cache[node_name], patch)
+        if not isinstance(data, dict):
+            raise PatchError(f"Patched node data must be an object, not {type(data).__name__}")
+        # Sizes of patched entries are estimated; the next full load or set corrects them
+        self._store(node_name, data, self.sizes[node_name] + json_size(patch))
+        self.stats["patches_applied"] += 1
+        if node_name not in self.dirty:
             self.dirty.add(node_name)
-            current_time = time.time()
-            
-            if (node_name not in self.last_write or 
-                current_time - self.last_write.get(node_name, 0) >= self.write_delay):
-                await self.flush(node_name)
-            else:
-                time_until_write = self.write_delay - (current_time - self.last_write.get(node_name, 0))
-                log_performance(f"Delaying write for {node_name} - {time_until_write:.1f}s until next write")
-
-    async def flush(self, node_name: str):
-        if node_name in self.dirty:
-            mem_before = get_process_memory()
-            start_time = time.time()
-            
-            data_dir, _ = ensure_dirs()
-            node_dir = os.path.join(data_dir, node_name)
-            os.makedirs(node_dir, exist_ok=True)
-            data_path = os.path.join(node_dir, 'data.json')
-            
-            data_size = len(str(self.cache[node_name]))
-            
-            atomic_write_json(data_path, self.cache[node_name])
-            write_time = time.time() - start_time
-            
-            self.last_write[node_name] = time.time()
-            self.dirty.remove(node_name)
-            
-            self.stats["total_writes"] += 1
-            self.stats["total_bytes_written"] += data_size
-            
-            log_performance(
-                f"Wrote {data_size:,} bytes to disk for {node_name} in {write_time*1000:.1f}ms", 
-                mem_before
-            )
-            
-            print(f"\nCache Performance Stats:")
-            print(f"  Total writes: {self.stats['total_writes']:,}")
-            print(f"  Total bytes written: {self.stats['total_bytes_written']:,}")
-            print(f"  Cache hits/misses: {self.stats['cache_hits']:,}/{self.stats['cache_misses']:,}")
-            print(f"  Current memory: {get_process_memory():.1f}MB")
-            print(f"  Peak memory: {self.stats['peak_memory']:.1f}MB")
+            self.dirty_since[node_name] = time.time()
+            self.pending_patches[node_name] = [patch]
+        elif node_name in self.pending_patches:
+            self.pending_patches[node_name].append(patch)
+        self._evict(keep={node_name})
+
+        self.start()
+        self._wakeup.set()
+        return data
 
     async def delete(self, node_name: str):
-        async with self.lock:
-            mem_before = get_process_memory()
-            if node_name in self.cache:
-                data_size = len(str(self.cache[node_name]))
-                log_performance(f"Deleting {node_name} from cache (size: {data_size:,} bytes)", mem_before)
-                del self.cache[node_name]
-            if node_name in self.dirty:
-                self.dirty.remove(node_name)
-            if node_name in self.last_write:
-                del self.last_write[node_name]
+        """Remove a node from the cache and from the store"""
+        # Wait for any in-flight write so it cannot recreate the node after deletion
+        async with self.write_lock:
+            async with self.lock:
+                self._drop(node_name)
+                self.dirty.discard(node_name)
+                self.dirty_since.pop(node_name, None)
+                self.flush_asap.discard(node_name)
+                self.pending_patches.pop(node_name, None)
+                self.last_write.pop(node_name, None)
+            await asyncio.get_running_loop().run_in_executor(node_io_executor, self.store.delete, node_name)
 
 # Initialize the cache
-node_cache = NodeCache()
+node_cache = NodeCache(
+    create_node_store(ensure_dirs()[0]),
+    max_entries=int(os.getenv('NODE_CACHE_MAX_ENTRIES', '1000')),
+    max_bytes=int(os.getenv('NODE_CACHE_MAX_MB', '256')) * 1024 * 1024,
+    compact_entries=int(os.getenv('NODE_LOG_COMPACT_ENTRIES', '100')),
+)
+
+_memory_sampler_task = None
+
+@app.on_event("startup")
+async def start_node_cache():
+    """Start the node cache write-behind flusher and the memory sampler"""
+    global _memory_sampler_task
+    node_cache.start()
+    _memory_sampler_task = asyncio.get_running_loop().create_task(memory_sampler_loop())
+
+@app.on_event("shutdown")
+async def stop_node_cache():
+    """Flush any pending node data before the server exits"""
+    if _memory_sampler_task is not None:
+        _memory_sampler_task.cancel()
+    await node_cache.stop()
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get node cache statistics, flush latency and write-behind backlog"""
+    return node_cache.get_stats()
+
+@app.get("/metrics")
+async def get_metrics(format: str = "prometheus"):
+    """Get server metrics in Prometheus text format, or as JSON with ?format=json"""
+    cache_stats = node_cache.get_stats()
+    cache_gauges = {
+        f"node_cache_{name}": value for name, value in cache_stats.items()
+        if isinstance(value, (int, float))
+    }
+    if format == "json":
+        return {**metrics.snapshot(), "node_cache": cache_stats}
+    return PlainTextResponse(metrics.render_prometheus(cache_gauges))
 
 # Replace the node data endpoints with cached versions
 @app.get("/node/{node_name}/data")
@@ -283,23 +767,56 @@ async def post_node_data(node_name: str, data: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/nodes/data")
+async def get_nodes_data(names: List[str] = Query(...)):
+    """Get data for several nodes in one request: /nodes/data?names=a&names=b"""
+    try:
+        return await node_cache.get_many(names)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/nodes/data")
+async def post_nodes_data(nodes: Dict[str, dict]):
+    """Save data for several nodes in one request, given as {node_name: data}"""
+    try:
+        await node_cache.set_many(nodes)
+        return {"status": "success", "count": len(nodes)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.patch("/node/{node_name}/data")
+async def patch_node_data(node_name: str, request: Request):
+    """Apply a JSON patch (RFC 6902) or JSON merge patch (RFC 7386) to node data
+
+    The patch type is taken from the Content-Type header
+    (application/json-patch+json or application/merge-patch+json); for
+    plain application/json a list body is a JSON patch and an object body
+    is a merge patch.
+    """
+    try:
+        body = await request.json()
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+
+    content_type = request.headers.get('content-type', '')
+    if 'json-patch' in content_type or ('merge-patch' not in content_type and isinstance(body, list)):
+        patch = {"type": "json", "patch": body}
+    else:
+        patch = {"type": "merge", "patch": body}
+
+    try:
+        await node_cache.patch(node_name, patch)
+        return {"status": "success"}
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.delete("/node/{node_name}/data")
 async def delete_node_data(node_name: str):
     """Delete node data"""
     try:
         await node_cache.delete(node_name)
-        data_dir, _ = ensure_dirs()
-        node_dir = os.path.join(data_dir, node_name)
-        data_path = os.path.join(node_dir, 'data.json')
-        
-        # Delete data.json if it exists
-        if os.path.exists(data_path):
-            os.remove(data_path)
-        
-        # Delete node directory if empty
-        if os.path.exists(node_dir) and not os.listdir(node_dir):
-            os.rmdir(node_dir)
-        
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -418,13 +935,15 @@ def add_timing_to_pipeline(pipe):
         pipe.vae_encode = timing_decorator(pipe.vae_encode)
     return pipe
 
-def setup_pipeline():
-    dtype = torch.bfloat16
-    bfl_repo = "black-forest-labs/FLUX.1-schnell"
-    revision = "refs/pr/1"
+def setup_pipeline(
+    bfl_repo: str = FLUX_REPO,
+    revision: Optional[str] = FLUX_REVISION,
+    clip_repo: str = CLIP_REPO,
+    dtype: torch.dtype = torch.bfloat16,
+):
     scheduler = FlowMatchEulerDiscreteScheduler.from_pretrained(bfl_repo, subfolder="scheduler", revision=revision)
-    text_encoder = CLIPTextModel.from_pretrained("openai/clip-vit-large-patch14", torch_dtype=dtype)
-    tokenizer = CLIPTokenizer.from_pretrained("openai/clip-vit-large-patch14", torch_dtype=dtype)
+    text_encoder = CLIPTextModel.from_pretrained(clip_repo, torch_dtype=dtype)
+    tokenizer = CLIPTokenizer.from_pretrained(clip_repo, torch_dtype=dtype)
     text_encoder_2 = T5EncoderModel.from_pretrained(bfl_repo, subfolder="text_encoder_2", torch_dtype=dtype, revision=revision)
     tokenizer_2 = T5TokenizerFast.from_pretrained(bfl_repo, subfolder="tokenizer_2", torch_dtype=dtype, revision=revision)
     vae = AutoencoderKL.from_pretrained(bfl_repo, subfolder="vae", torch_dtype=dtype, revision=revision)
@@ -441,9 +960,8 @@ def setup_pipeline():
     )
     pipe.text_encoder_2 = text_encoder_2
     pipe.transformer = transformer
-    pipe.enable_model_cpu_offload()
 
-    # Create img2img pipeline
+    # Create img2img pipeline sharing the same components
     pipe_img2img = FluxImg2ImgPipeline(
         scheduler=scheduler,
         text_encoder=text_encoder,
@@ -453,10 +971,303 @@ def setup_pipeline():
         vae=vae,
         transformer=transformer,
     )
-    pipe_img2img.enable_model_cpu_offload()
+
+    # CPU offload needs an accelerator; without one everything simply stays on the CPU
+    if torch.cuda.is_available():
+        pipe.enable_model_cpu_offload()
+        pipe_img2img.enable_model_cpu_offload()
 
     return pipe, pipe_img2img, dtype
 
+def setup_redux_pipeline(repo_redux: str = REDUX_REPO, dtype: torch.dtype = torch.bfloat16, revision: Optional[str] = REDUX_REVISION):
+    return FluxPriorReduxPipeline.from_pretrained(repo_redux, revision=revision, torch_dtype=dtype)
+
+def _collect_modules(obj, modules: list):
+    if isinstance(obj, torch.nn.Module):
+        modules.append(obj)
+    elif isinstance(obj, (tuple, list)):
+        for item in obj:
+            _collect_modules(item, modules)
+    elif hasattr(obj, 'components'):
+        for component in obj.components.values():
+            _collect_modules(component, modules)
+
+def module_nbytes(obj) -> int:
+    """Bytes held by the torch modules in a pipeline (or tuple of pipelines).
+
+    Tensors shared between pipelines, such as a common transformer, are
+    counted once.
+    """
+    modules = []
+    _collect_modules(obj, modules)
+    seen = set()
+    total = 0
+    for module in modules:
+        for tensor in itertools.chain(module.parameters(), module.buffers()):
+            key = (tensor.device, tensor.data_ptr())
+            if key in seen:
+                continue
+            seen.add(key)
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+class PipelineRegistry:
+    """Process-wide cache of loaded model pipelines.
+
+    Loaders are registered by name and run on first use (or at startup via
+    warm_up); the result stays resident across requests. When a memory
+    budget is set, the least recently used pipelines are released to make
+    room for a new one. Loading happens under a lock so concurrent requests
+    never load the same weights twice.
+    """
+
+    def __init__(self, memory_budget_bytes: Optional[int] = None):
+        self.loaders = {}
+        self.loaded = OrderedDict()
+        self.sizes = {}
+        self.memory_budget_bytes = memory_budget_bytes
+        self.lock = threading.RLock()
+
+    def register(self, name: str, loader):
+        """Register a zero-argument loader, dropping any pipeline already loaded under name"""
+        with self.lock:
+            self.loaders[name] = loader
+            self.release(name)
+
+    def get(self, name: str):
+        with self.lock:
+            if name in self.loaded:
+                self.loaded.move_to_end(name)
+                return self.loaded[name]
+            if name not in self.loaders:
+                raise KeyError(f"No pipeline registered as {name!r}")
+
+            start_time = time.time()
+            value = self.loaders[name]()
+            self.loaded[name] = value
+            self.sizes[name] = module_nbytes(value)
+            metrics.observe("pipeline_load_ms", (time.time() - start_time) * 1000)
+            metrics.inc("pipeline_loads_total")
+            print(f"Loaded pipeline {name} ({self.sizes[name] / 1024**3:.2f}GB) in {time.time() - start_time:.1f}s")
+            self._evict(keep=name)
+            return value
+
+    def release(self, name: str):
+        with self.lock:
+            if self.loaded.pop(name, None) is not None:
+                del self.sizes[name]
+                metrics.inc("pipeline_evictions_total")
+                gc.collect()
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+
+    def _evict(self, keep: str):
+        if self.memory_budget_bytes is None:
+            return
+        for name in list(self.loaded):
+            if sum(self.sizes.values()) <= self.memory_budget_bytes:
+                break
+            if name != keep:
+                print(f"Releasing pipeline {name} to stay within the memory budget")
+                self.release(name)
+
+    def warm_up(self, names: List[str]):
+        for name in names:
+            self.get(name)
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                "registered": list(self.loaders),
+                "loaded": {name: self.sizes[name] for name in self.loaded},
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+def _load_flux_pipelines():
+    pipe, pipe_img2img, dtype = setup_pipeline()
+    return add_timing_to_pipeline(pipe), pipe_img2img, dtype
+
+def _load_redux_pipeline():
+    return add_timing_to_pipeline(setup_redux_pipeline())
+
+pipeline_registry = PipelineRegistry(
+    memory_budget_bytes=int(PIPELINE_MEMORY_BUDGET_GB * 1024**3) if PIPELINE_MEMORY_BUDGET_GB > 0 else None
+)
+pipeline_registry.register("flux", _load_flux_pipelines)
+pipeline_registry.register("redux", _load_redux_pipeline)
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class EmbeddingCache:
+    """Redux image embeddings keyed by image content hash and model revision.
+
+    Recently used embeddings stay in memory (LRU, max_entries); every entry
+    is also saved under cache_dir as a safetensors file, which is
+    memory-mapped back in when it is not in memory.
+    """
+
+    def __init__(self, cache_dir: str, model_id: str, max_entries: int = 64):
+        self.cache_dir = cache_dir
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def key(self, image_path: str) -> str:
+        """Cache key for an image: its content hash combined with the model revision."""
+        digest = hashlib.sha256(f"{self.model_id}\0{file_sha256(image_path)}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + '.safetensors')
+
+    def get(self, key: str) -> Optional[Dict[str, torch.Tensor]]:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self.entries[key]
+        path = self._path(key)
+        if not os.path.exists(path):
+            with self.lock:
+                self.stats["misses"] += 1
+            return None
+        try:
+            with safe_open(path, framework="pt") as f:
+                embeds = {name: f.get_tensor(name) for name in f.keys()}
+        except Exception as e:
+            print(f"Ignoring unreadable embedding cache entry {path}: {str(e)}")
+            return None
+        with self.lock:
+            self.stats["disk_hits"] += 1
+        self._remember(key, embeds)
+        return embeds
+
+    def put(self, key: str, embeds: Dict[str, torch.Tensor]):
+        tensors = {name: tensor.detach().cpu().contiguous() for name, tensor in embeds.items()}
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        save_safetensors(tensors, temp_path, metadata={"model": self.model_id})
+        os.replace(temp_path, path)
+        self._remember(key, embeds)
+
+    def _remember(self, key: str, embeds: Dict[str, torch.Tensor]):
+        with self.lock:
+            self.entries[key] = embeds
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries), "model": self.model_id}
+
+# Image hashing and decoding for the interpolation encode stage
+image_decode_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('IMAGE_DECODE_WORKERS', '4')),
+    thread_name_prefix='image-decode',
+)
+
+embedding_cache = EmbeddingCache(
+    os.path.join(os.getcwd(), EMBEDDINGS_DIR),
+    model_id=f"{REDUX_REPO}@{REDUX_REVISION or 'main'}",
+    max_entries=int(os.getenv('EMBEDDING_CACHE_ENTRIES', '64')),
+)
+
+def redux_input_size(pipe_prior_redux) -> Optional[Tuple[Tuple[int, int], int]]:
+    """The (width, height) and resample filter the Redux image processor resizes to, if known."""
+    processor = getattr(pipe_prior_redux, 'feature_extractor', None)
+    try:
+        return (processor.size['width'], processor.size['height']), processor.resample
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+def decode_image(path: str, resize: Optional[Tuple[Tuple[int, int], int]] = None) -> Image.Image:
+    image = load_image(path)
+    if resize is not None:
+        # Same size and filter as the processor, so its own resize becomes a no-op
+        size, resample = resize
+        image = image.resize(size, Image.Resampling(resample))
+    return image
+
+def prefetch_images(image_paths: List[str], resize=None, max_pending: int = 8):
+    """Yield decoded images in order while the next ones decode on the image pool.
+
+    At most max_pending images are decoding or decoded ahead of the
+    consumer, which bounds the memory held by the prefetch window.
+    """
+    paths = iter(image_paths)
+    pending = deque(
+        image_decode_executor.submit(decode_image, path, resize)
+        for path in itertools.islice(paths, max_pending)
+    )
+    try:
+        while pending:
+            image = pending.popleft().result()
+            path = next(paths, None)
+            if path is not None:
+                pending.append(image_decode_executor.submit(decode_image, path, resize))
+            yield image
+    finally:
+        for future in pending:
+            future.cancel()
+
+def encode_images(
+    image_paths: List[str],
+    pipe_prior_redux: Optional[FluxPriorReduxPipeline] = None,
+) -> Tuple[List[str], Dict[str, Dict[str, torch.Tensor]]]:
+    """Redux-encode images through the embedding cache.
+
+    Returns one cache key per path and the embeddings by key, so identical
+    images are encoded once and different images sharing a basename never
+    collide. The Redux pipeline is only fetched from the registry when an
+    image actually has to be encoded and pipe_prior_redux is None.
+
+    Hashing and decoding run on the image pool, so the model encodes one
+    image while the following ones are read and decoded.
+    """
+    keys = list(image_decode_executor.map(embedding_cache.key, image_paths))
+    encoded_images = {}
+    missing = {}
+    for img_path, key in zip(image_paths, keys):
+        if key in encoded_images or key in missing:
+            continue
+        embeds = embedding_cache.get(key)
+        if embeds is None:
+            metrics.inc("embedding_cache_misses_total")
+            missing[key] = img_path
+        else:
+            metrics.inc("embedding_cache_hits_total")
+            encoded_images[key] = embeds
+
+    if not missing:
+        return keys, encoded_images
+    if pipe_prior_redux is None:
+        pipe_prior_redux = pipeline_registry.get("redux")
+    images = prefetch_images(list(missing.values()), redux_input_size(pipe_prior_redux), IMAGE_PREFETCH)
+    for (key, img_path), image in zip(missing.items(), images):
+        print(f"  Encoding {os.path.basename(img_path)}")
+        with pipeline_call_guard():
+            base_output = pipe_prior_redux(
+                image,
+                prompt_embeds_scale=1.0,
+                pooled_prompt_embeds_scale=1.0
+            )
+        embeds = {
+            'prompt_embeds': base_output['prompt_embeds'],
+            'pooled_prompt_embeds': base_output['pooled_prompt_embeds']
+        }
+        embedding_cache.put(key, embeds)
+        encoded_images[key] = embeds
+    return keys, encoded_images
+
 def parse_frames_list(frames_str: str) -> List[int]:
     """Parse frames string into list of frame counts."""
     try:
@@ -468,10 +1279,393 @@ def parse_frames_list(frames_str: str) -> List[int]:
     except ValueError:
         raise ValueError("Frames must be integers, either single number or comma-separated list")
 
+def prepare_transition_latents(
+    pipe: FluxPipeline,
+    num_frames: int,
+    height: int,
+    width: int,
+    generator: torch.Generator,
+    noise_blend_amount: Optional[float],
+) -> torch.Tensor:
+    """Draw the latent chain for one transition as a (num_frames, seq_len, channels) tensor.
+
+    Each frame blends the previous frame's latents with fresh noise. Noise
+    is drawn from generator in the same order as frame-by-frame generation,
+    so batched and unbatched renders start from identical latents.
+    """
+    frames = []
+    latents = None
+    for _ in range(num_frames):
+        if latents is None or noise_blend_amount is not None:
+            new_latents, _ = pipe.prepare_latents(
+                batch_size=1,
+                num_channels_latents=pipe.transformer.config.in_channels // 4,
+                height=height,
+                width=width,
+                dtype=pipe.dtype,
+                device=pipe.device,
+                generator=generator,
+            )
+            if latents is None:
+                latents = new_latents
+            else:
+                latents = (1 - noise_blend_amount) * latents + noise_blend_amount * new_latents
+        frames.append(latents)
+    return torch.cat(frames)
+
+def auto_micro_batch_size(height: int, width: int) -> int:
+    """Pick how many frames to denoise per pipeline call from available memory.
+
+    INTERPOLATION_BATCH_SIZE overrides the estimate. Otherwise half of the
+    free accelerator memory (or free RAM without CUDA) is divided by a rough
+    per-frame activation cost proportional to the pixel count.
+    """
+    if INTERPOLATION_BATCH_SIZE > 0:
+        return INTERPOLATION_BATCH_SIZE
+    if torch.cuda.is_available():
+        available = torch.cuda.mem_get_info()[0]
+    else:
+        available = psutil.virtual_memory().available
+    per_frame = height * width * FRAME_BYTES_PER_PIXEL
+    return max(1, min(MAX_MICRO_BATCH_SIZE, int(available * 0.5 // per_frame)))
+
+def _ramp(num_frames: int, frame_span: Optional[float] = None) -> torch.Tensor:
+    """Blend fractions 0..1 for a transition's frames.
+
+    With frame_span (the exact transition length in frame intervals, from
+    timestamps and fps) frame j sits at j / frame_span, so rounding the
+    frame count does not stretch or squash the transition.
+    """
+    if frame_span is None or frame_span <= 0:
+        return torch.linspace(0.0, 1.0, num_frames)
+    return (torch.arange(num_frames, dtype=torch.float32) / frame_span).clamp(0.0, 1.0)
+
+def _linear_weights(t: torch.Tensor, emb1: torch.Tensor, emb2: torch.Tensor):
+    t = t.view(-1, *[1] * (emb1.dim() - 1))
+    return 1 - t, t
+
+def _cosine_weights(t: torch.Tensor, emb1: torch.Tensor, emb2: torch.Tensor):
+    return _linear_weights((1 - torch.cos(math.pi * t)) / 2, emb1, emb2)
+
+def _slerp_weights(t: torch.Tensor, emb1: torch.Tensor, emb2: torch.Tensor):
+    # One angle per embedding vector (last dim), shared by every frame of the transition
+    a = emb1.float()
+    b = emb2.float()
+    cos_omega = (a * b).sum(-1, keepdim=True) / (a.norm(dim=-1, keepdim=True) * b.norm(dim=-1, keepdim=True)).clamp_min(1e-8)
+    omega = torch.acos(cos_omega.clamp(-1.0, 1.0))
+    sin_omega = torch.sin(omega)
+    t = t.view(-1, *[1] * (emb1.dim() - 1))
+    # Nearly parallel vectors fall back to a linear blend
+    parallel = sin_omega < 1e-4
+    safe_sin = torch.where(parallel, torch.ones_like(sin_omega), sin_omega)
+    w1 = torch.where(parallel, 1 - t, torch.sin((1 - t) * omega) / safe_sin)
+    w2 = torch.where(parallel, t, torch.sin(t * omega) / safe_sin)
+    return w1, w2
+
+# Easing curves map blend fractions to per-frame weights for the two
+# embeddings; "timestamp" is a linear blend along the timestamp-derived ramp.
+EASING_CURVES = {
+    "linear": _linear_weights,
+    "cosine": _cosine_weights,
+    "slerp": _slerp_weights,
+    "timestamp": _linear_weights,
+}
+
+def blend_schedule(
+    emb1: Dict[str, torch.Tensor],
+    emb2: Dict[str, torch.Tensor],
+    num_frames: int,
+    easing: str = "slerp",
+    frame_span: Optional[float] = None,
+) -> Dict[str, Tuple[torch.Tensor, torch.Tensor]]:
+    """Compute the (w1, w2) blend weights of every frame of a transition at once."""
+    if easing not in EASING_CURVES:
+        raise ValueError(f"Unknown easing '{easing}', expected one of {sorted(EASING_CURVES)}")
+    t = _ramp(num_frames, frame_span if easing == "timestamp" else None)
+    curve = EASING_CURVES[easing]
+    return {key: curve(t, emb1[key], emb2[key]) for key in emb1}
+
+class BlendScheduleCache:
+    """Blend schedules of recent transitions, least recently used dropped beyond max_entries.
+
+    Slerp weights depend on the embeddings, so entries are keyed by both
+    embedding cache keys along with the frame count, easing and span. The
+    cache lives across renders, because segment renders see one transition
+    per call.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, img1_key: str, img2_key: str, emb1, emb2, num_frames: int, easing: str,
+            frame_span: Optional[float]) -> Dict[str, Tuple[torch.Tensor, torch.Tensor]]:
+        key = (img1_key, img2_key, num_frames, easing, frame_span)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                metrics.inc("blend_schedule_cache_hits_total")
+                return self.entries[key]
+        metrics.inc("blend_schedule_cache_misses_total")
+        schedule = blend_schedule(emb1, emb2, num_frames, easing, frame_span)
+        with self.lock:
+            self.entries[key] = schedule
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return schedule
+
+blend_schedules = BlendScheduleCache(int(os.getenv('BLEND_SCHEDULE_CACHE_ENTRIES', '64')))
+
+def blend_embeddings(
+    emb1: Dict[str, torch.Tensor],
+    emb2: Dict[str, torch.Tensor],
+    schedule: Dict[str, Tuple[torch.Tensor, torch.Tensor]],
+    start: int,
+    end: int,
+) -> Dict[str, torch.Tensor]:
+    """Materialise the blended embeddings of frames start..end in one broadcasted op."""
+    blended = {}
+    for key, (w1, w2) in schedule.items():
+        dtype = emb1[key].dtype
+        blended[key] = w1[start:end].to(dtype) * emb1[key] + w2[start:end].to(dtype) * emb2[key]
+    return blended
+
+class MemoryGovernor:
+    """Reclaim memory between frames only when usage crosses a threshold.
+
+    With CUDA the caching allocator's reserved bytes are compared with the
+    device size; the process RSS is always compared with system memory.
+    Crossing either threshold runs gc.collect() (and synchronize plus
+    empty_cache with CUDA); below them a check only reads the usage
+    counters. While usage stays above a threshold, collecting again
+    waits until it has grown by growth_fraction (of the device or system
+    memory) since the last collection, or until min_interval seconds
+    have passed. Checks and collections are reported through metrics.
+    """
+
+    def __init__(self, cuda_fraction: float = 0.9, rss_fraction: float = 0.8,
+                 growth_fraction: float = 0.05, min_interval: float = 30.0):
+        self.cuda_fraction = cuda_fraction
+        self.rss_fraction = rss_fraction
+        self.growth_fraction = growth_fraction
+        self.min_interval = min_interval
+        self.memory_total_mb = psutil.virtual_memory().total / 1024 / 1024
+        self.cuda_total = None
+        # Usage left by the last collection, per reason; cleared once usage drops below the threshold
+        self.collected_usage = {}
+        self.last_collect = 0.0
+
+    def _cuda_usage(self) -> Optional[float]:
+        if not torch.cuda.is_available():
+            return None
+        if self.cuda_total is None:
+            self.cuda_total = torch.cuda.get_device_properties(torch.cuda.current_device()).total_memory
+        reserved = torch.cuda.memory_reserved()
+        metrics.set_gauge("cuda_reserved_mb", reserved / 1024 / 1024)
+        return reserved / self.cuda_total
+
+    def check(self) -> Optional[str]:
+        """Collect if over a threshold; returns the reason, or None when nothing was done."""
+        metrics.inc("memory_governor_checks_total")
+        reason = None
+        cuda_usage = self._cuda_usage()
+        rss_usage = sample_process_memory() / self.memory_total_mb
+        if cuda_usage is not None and cuda_usage >= self.cuda_fraction:
+            reason, usage = "cuda", cuda_usage
+        else:
+            self.collected_usage.pop("cuda", None)
+            if rss_usage >= self.rss_fraction:
+                reason, usage = "rss", rss_usage
+            else:
+                self.collected_usage.pop("rss", None)
+        if reason is None:
+            return None
+        collected_usage = self.collected_usage.get(reason)
+        if (collected_usage is not None and usage < collected_usage + self.growth_fraction
+                and time.time() - self.last_collect < self.min_interval):
+            metrics.inc("memory_governor_skipped_total")
+            return None
+
+        start_time = time.time()
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        metrics.inc(f"memory_governor_collections_{reason}_total")
+        metrics.observe("memory_governor_collect_ms", (time.time() - start_time) * 1000)
+        self.last_collect = time.time()
+        self.collected_usage[reason] = (
+            self._cuda_usage() if reason == "cuda" else sample_process_memory() / self.memory_total_mb
+        )
+        return reason
+
+    def peak_accelerator_gb(self) -> float:
+        if not torch.cuda.is_available():
+            return 0.0
+        return max_memory_allocated() / 1024**3
+
+memory_governor = MemoryGovernor(
+    cuda_fraction=float(os.getenv('MEMORY_GOVERNOR_CUDA_FRACTION', '0.9')),
+    rss_fraction=float(os.getenv('MEMORY_GOVERNOR_RSS_FRACTION', '0.8')),
+    growth_fraction=float(os.getenv('MEMORY_GOVERNOR_GROWTH_FRACTION', '0.05')),
+    min_interval=float(os.getenv('MEMORY_GOVERNOR_MIN_INTERVAL', '30')),
+)
+
+# With CPU offload every pipeline call moves the shared modules between
+# devices, so concurrent renders take turns inside the pipelines
+pipeline_call_lock = threading.Lock()
+
+def pipeline_call_guard():
+    return pipeline_call_lock if torch.cuda.is_available() else contextlib.nullcontext()
+
+def render_pipelines(*pipes):
+    """Per-render copies of pipelines that share weights but not scheduler state.
+
+    Schedulers keep timesteps and step index on the instance, so renders
+    running side by side each need their own. Pipelines that shared a
+    scheduler keep sharing the render's copy.
+    """
+    schedulers = {}
+    views = []
+    for pipe in pipes:
+        if pipe is None:
+            views.append(None)
+            continue
+        view = copy.copy(pipe)
+        if id(pipe.scheduler) not in schedulers:
+            schedulers[id(pipe.scheduler)] = copy.deepcopy(pipe.scheduler)
+        view.scheduler = schedulers[id(pipe.scheduler)]
+        views.append(view)
+    return views
+
+class RenderCheckpoint:
+    """Frames and latents of a render persisted so a restart can resume it.
+
+    Every finished frame is saved as a raw uint8 array (lossless, and far
+    cheaper than PNG on the render path) and each transition in progress
+    keeps its latents (transitions draw noise from their own seed, so no
+    other generator state is needed). The micro-batch size is fixed on the
+    first run, so resumed frames are batched exactly as before and come out
+    bit-identical.
+    """
+
+    def __init__(self, directory: str, batch_size: int):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        else:
+            manifest = {"batch_size": batch_size}
+            with open(manifest_path + '.tmp', 'w') as f:
+                json.dump(manifest, f)
+            os.replace(manifest_path + '.tmp', manifest_path)
+        self.batch_size = manifest["batch_size"]
+
+    def _frame_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"frame_{index:05d}.npy")
+
+    def _transition_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"transition_{index:04d}.pt")
+
+    def done_frames(self, start: int, count: int) -> int:
+        """Number of consecutive frames from start that are already saved."""
+        done = 0
+        while done < count and os.path.exists(self._frame_path(start + done)):
+            done += 1
+        return done
+
+    def load_frame(self, index: int) -> Image.Image:
+        return Image.fromarray(np.load(self._frame_path(index)))
+
+    def save_frame(self, index: int, image: Image.Image):
+        path = self._frame_path(index)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, np.asarray(image.convert('RGB')))
+        os.replace(path + '.tmp', path)
+
+    def load_transition(self, index: int) -> Optional[dict]:
+        path = self._transition_path(index)
+        if not os.path.exists(path):
+            return None
+        return torch.load(path)
+
+    def save_transition(self, index: int, latents: torch.Tensor):
+        path = self._transition_path(index)
+        torch.save({"latents": latents.cpu()}, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def finish_transition(self, index: int):
+        path = self._transition_path(index)
+        if os.path.exists(path):
+            os.remove(path)
+
+def trim_render_checkpoints(renders_dir: str, max_age: float):
+    """Remove checkpoints of failed or abandoned renders not written to for max_age seconds."""
+    if not os.path.isdir(renders_dir):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(renders_dir):
+        directory = os.path.join(renders_dir, name)
+        try:
+            # Every saved frame or transition updates the directory's mtime
+            if os.path.getmtime(directory) < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                metrics.inc("render_checkpoints_expired_total")
+        except OSError:
+            continue
+
+def transition_seed(seed: int, img1_key: str, img2_key: str) -> int:
+    """Seed of one transition, derived from the render seed and both image hashes."""
+    digest = hashlib.sha256(f"{seed}:{img1_key}:{img2_key}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big') & (2**63 - 1)
+
+def sparse_keyframe_count(num_frames: int, keyframe_stride: int) -> int:
+    """Keyframes generated for a transition of num_frames, first and last included."""
+    return min(num_frames, math.ceil((num_frames - 1) / keyframe_stride) + 1)
+
+class KeyframeExpander:
+    """Expand sparse keyframes to full transitions by cross-fading between them.
+
+    Keyframe m of a transition with n frames and k keyframes sits at frame
+    m * (n - 1) / (k - 1). When a keyframe arrives the frames up to its
+    position are blended from it and the keyframe before and passed on.
+    """
+
+    def __init__(self, frames_per_transition: List[int], keyframes_per_transition: List[int],
+                 on_frame: Callable[[Image.Image], None]):
+        self.frames_per_transition = frames_per_transition
+        self.keyframes_per_transition = keyframes_per_transition
+        self.on_frame = on_frame
+        self.transition = 0
+        self.keyframe = 0
+        self.previous = None
+
+    def __call__(self, image: Image.Image):
+        num_frames = self.frames_per_transition[self.transition]
+        num_keyframes = self.keyframes_per_transition[self.transition]
+        if self.keyframe == 0:
+            self.on_frame(image)
+        else:
+            position = self.keyframe * (num_frames - 1) / (num_keyframes - 1)
+            previous_position = (self.keyframe - 1) * (num_frames - 1) / (num_keyframes - 1)
+            for j in range(math.floor(previous_position) + 1, math.floor(position) + 1):
+                t = (j - previous_position) / (position - previous_position)
+                self.on_frame(image if t >= 1 else Image.blend(self.previous, image, t))
+        self.previous = image
+        self.keyframe += 1
+        if self.keyframe == num_keyframes:
+            self.transition += 1
+            self.keyframe = 0
+            self.previous = None
+
 def process_image_batch(
     image_paths: List[str],
     pipe: FluxPipeline,
-    pipe_prior_redux: FluxPriorReduxPipeline,
+    pipe_prior_redux: Optional[FluxPriorReduxPipeline],
     frames_per_transition: List[int],
     height: int = 1024,
     width: int = 1024,
@@ -480,9 +1674,81 @@ def process_image_batch(
     guidance_scale: float = 1.5,
     seed: int = 12345,
     denoised_image: Optional[float] = None,
-    pipe_img2img: Optional[FluxImg2ImgPipeline] = None
-) -> Tuple[List[Image.Image], List[float]]:
-    """Process a batch of images to create interpolated frames between them."""
+    pipe_img2img: Optional[FluxImg2ImgPipeline] = None,
+    batch_size: Optional[int] = None,
+    easing: str = "slerp",
+    frame_spans: Optional[List[float]] = None,
+    on_frame: Optional[Callable[[Image.Image], None]] = None,
+    checkpoint_dir: Optional[str] = None,
+    initial_image: Optional[Image.Image] = None,
+    keyframe_stride: int = 1
+) -> Tuple[List[Image.Image], List[float], int]:
+    """Process a batch of images to create interpolated frames between them.
+
+    Without denoised_image the frames of a transition do not depend on each
+    other and are generated batch_size at a time (sized from available
+    memory when None). With denoised_image each frame is refined from the
+    previous one, so frames are generated one by one.
+
+    Image embeddings come from the embedding cache; pipe_prior_redux may be
+    None to load the Redux pipeline only if an image has to be encoded.
+    Embeddings are blended with the easing curve named by easing; the
+    "timestamp" curve follows frame_spans, the exact length of each
+    transition in frame intervals.
+
+    With on_frame every frame is handed to the callback as soon as it is
+    generated instead of being collected, and the returned frame list is
+    empty.
+
+    With checkpoint_dir every frame is persisted as it completes and a
+    rerun with the same arguments loads finished frames instead of
+    generating them again. Returns the frames, the generation time of
+    every generated frame and the number of frames loaded from the
+    checkpoint.
+
+    Each transition seeds its noise from seed and its two image hashes.
+    initial_image stands in for the frame before the first one, so an
+    img2img render can continue from an earlier segment.
+
+    With keyframe_stride > 1 only about every keyframe_stride-th frame of a
+    transition is generated and the frames in between are cross-faded
+    (see KeyframeExpander); checkpoints then hold the keyframes, and the
+    generation times and loaded count refer to keyframes.
+    """
+    if keyframe_stride > 1:
+        keyframes_per_transition = [sparse_keyframe_count(n, keyframe_stride) for n in frames_per_transition]
+        if frame_spans is not None:
+            # Keyframes keep their place on the timeline, keyframe m at frame m * (n - 1) / (k - 1)
+            frame_spans = [
+                span * (k - 1) / (n - 1) if n > 1 else span
+                for span, n, k in zip(frame_spans, frames_per_transition, keyframes_per_transition)
+            ]
+        results = []
+        expander = KeyframeExpander(frames_per_transition, keyframes_per_transition, on_frame or results.append)
+        _, generation_times, resumed_frames = process_image_batch(
+            image_paths=image_paths,
+            pipe=pipe,
+            pipe_prior_redux=pipe_prior_redux,
+            frames_per_transition=keyframes_per_transition,
+            height=height,
+            width=width,
+            noise_blend_amount=noise_blend_amount,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            seed=seed,
+            denoised_image=denoised_image,
+            pipe_img2img=pipe_img2img,
+            batch_size=batch_size,
+            easing=easing,
+            frame_spans=frame_spans,
+            on_frame=expander,
+            checkpoint_dir=checkpoint_dir,
+            initial_image=initial_image
+        )
+        return results, generation_times, resumed_frames
+
+    if easing not in EASING_CURVES:
+        raise ValueError(f"Unknown easing '{easing}', expected one of {sorted(EASING_CURVES)}")
     if denoised_image is not None:
         if pipe_img2img is None:
             raise ValueError("pipe_img2img must be provided when denoised_image is set")
@@ -490,168 +1756,266 @@ def process_image_batch(
             raise ValueError("denoised_image must be between 0 and 1")
 
     print(f"\nEncoding {len(image_paths)} images...")
-    encoded_images = {}
-    for img_path in image_paths:
-        img_name = os.path.basename(img_path)
-        img = load_image(img_path)
-        base_output = pipe_prior_redux(
-            img,
-            prompt_embeds_scale=1.0,
-            pooled_prompt_embeds_scale=1.0
-        )
-        encoded_images[img_name] = {
-            'prompt_embeds': base_output['prompt_embeds'],
-            'pooled_prompt_embeds': base_output['pooled_prompt_embeds']
-        }
+    image_keys, encoded_images = encode_images(image_paths, pipe_prior_redux)
 
     results = []
     generation_times = []
-    generator = torch.Generator().manual_seed(seed)
+    resumed_frames = 0
+    previous_image = initial_image
+    frame_index = 0
+    if batch_size is None:
+        batch_size = auto_micro_batch_size(height, width)
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = RenderCheckpoint(checkpoint_dir, batch_size)
+        batch_size = checkpoint.batch_size
+
+    def emit(image: Image.Image, generated: bool = True):
+        nonlocal frame_index
+        if generated and checkpoint is not None:
+            checkpoint.save_frame(frame_index, image)
+        frame_index += 1
+        if on_frame is not None:
+            on_frame(image)
+        else:
+            results.append(image)
     
     for i in range(len(image_paths) - 1):
         img1_name = os.path.basename(image_paths[i])
         img2_name = os.path.basename(image_paths[i + 1])
+        img1_key = image_keys[i]
+        img2_key = image_keys[i + 1]
         num_frames = frames_per_transition[i]
         
         print(f"\nGenerating {num_frames} frames between {img1_name} and {img2_name}")
         
-        strengths_1 = torch.linspace(1.0, 0.0, num_frames)
-        strengths_2 = torch.linspace(0.0, 1.0, num_frames)
+        # Frames already checkpointed; unbatched frames resume exactly where
+        # they stopped, batched ones at the start of the interrupted batch
+        resume_at = 0
+        saved = None
+        if checkpoint is not None:
+            done = checkpoint.done_frames(frame_index, num_frames)
+            resume_at = done if done == num_frames or denoised_image is not None else done - done % batch_size
+            saved = checkpoint.load_transition(i)
+        if resume_at > 0:
+            print(f"  Resuming after {resume_at} checkpointed frames")
+            resumed_frames += resume_at
+        for j in range(resume_at):
+            previous_image = checkpoint.load_frame(frame_index)
+            emit(previous_image, generated=False)
+        if resume_at == num_frames:
+            checkpoint.finish_transition(i)
+            continue
         
-        previous_latents = None
-        
-        for j, (strength1, strength2) in enumerate(zip(strengths_1, strengths_2)):
-            combined_output = {
-                'prompt_embeds': (
-                    encoded_images[img1_name]['prompt_embeds'] * strength1 +
-                    encoded_images[img2_name]['prompt_embeds'] * strength2
-                ),
-                'pooled_prompt_embeds': (
-                    encoded_images[img1_name]['pooled_prompt_embeds'] * strength1 +
-                    encoded_images[img2_name]['pooled_prompt_embeds'] * strength2
-                )
-            }
-            
-            if previous_latents is None:
-                latents, _ = pipe.prepare_latents(
-                    batch_size=1,
-                    num_channels_latents=pipe.transformer.config.in_channels // 4,
-                    height=height,
-                    width=width,
-                    dtype=pipe.dtype,
-                    device=pipe.device,
-                    generator=generator,
-                )
-                batch_size, seq_len, hidden_dim = latents.shape
-                latents = latents.view(batch_size, seq_len, -1)
-            else:
-                if noise_blend_amount is not None:
-                    new_latents, _ = pipe.prepare_latents(
-                        batch_size=1,
-                        num_channels_latents=pipe.transformer.config.in_channels // 4,
-                        height=height,
-                        width=width,
-                        dtype=pipe.dtype,
-                        device=pipe.device,
-                        generator=generator
-                    )
-                    new_latents = new_latents.view(batch_size, seq_len, -1)
-                    latents = (1 - noise_blend_amount) * previous_latents + noise_blend_amount * new_latents
-                else:
-                    latents = previous_latents
-            
-            previous_latents = latents
-            
-            t_start = time.time()
-            if denoised_image is not None and len(results) > 0:
-                image = pipe_img2img(
-                    image=results[-1],
-                    width=width,
-                    height=height,
-                    num_inference_steps=num_inference_steps,
-                    guidance_scale=guidance_scale,
-                    strength=denoised_image,
-                    latents=latents,
-                    **combined_output,
-                ).images[0]
-            else:
-                image = pipe(
-                    width=width,
-                    height=height,
-                    num_inference_steps=num_inference_steps,
-                    guidance_scale=guidance_scale,
-                    latents=latents,
-                    **combined_output,
-                ).images[0]
-            gen_time = time.time() - t_start
-            
-            results.append(image)
-            generation_times.append(gen_time)
-            
-            synchronize()
-            gc.collect()
-            torch.cuda.empty_cache()
-            
-            print(f"  Frame {j+1}/{num_frames}", end="\r")
-        print()
-    
-    return results, generation_times
-
-def create_interpolation_video(results, output_path='interpolation.mp4', fps=12, size=512):
-    """Create a video from a sequence of images and optionally save frames."""
-    output_dir = os.path.splitext(output_path)[0] + "_frames"
-    if os.path.exists(output_dir):
-        import shutil
-        shutil.rmtree(output_dir)
-    os.makedirs(output_dir)
-    
-    print(f"\nSaving frames to {output_dir}/")
-    for i, img in enumerate(results):
-        img = img.resize((size, size), Image.Resampling.LANCZOS)
-        frame_path = os.path.join(output_dir, f"frame_{i:04d}.png")
-        img.save(frame_path)
-        print(f"  Frame {i+1}/{len(results)}", end="\r")
-    print()
-    
-    try:
-        import subprocess
+        if saved is not None:
+            latents = saved['latents'].to(device=pipe.device, dtype=pipe.dtype)
+        else:
+            # Each transition draws its noise from its own seed, so it can be
+            # rendered (and cached) independently of the others
+            generator = torch.Generator().manual_seed(transition_seed(seed, img1_key, img2_key))
+            latents = prepare_transition_latents(pipe, num_frames, height, width, generator, noise_blend_amount)
+            if checkpoint is not None:
+                checkpoint.save_transition(i, latents)
         
-        current_dir = os.getcwd()
-        os.chdir(output_dir)
+        emb1 = encoded_images[img1_key]
+        emb2 = encoded_images[img2_key]
+        frame_span = frame_spans[i] if frame_spans is not None else None
+        schedule = blend_schedules.get(img1_key, img2_key, emb1, emb2, num_frames, easing, frame_span)
         
-        output_path_abs = os.path.abspath(os.path.join(current_dir, output_path))
+        if denoised_image is None:
+            # Frames of a transition are independent, so run them in micro-batches
+            for start in range(resume_at, num_frames, batch_size):
+                end = min(start + batch_size, num_frames)
+                t_start = time.time()
+                with pipeline_call_guard():
+                    images = pipe(
+                        width=width,
+                        height=height,
+                        num_inference_steps=num_inference_steps,
+                        guidance_scale=guidance_scale,
+                        latents=latents[start:end],
+                        **blend_embeddings(emb1, emb2, schedule, start, end),
+                    ).images
+                gen_time = (time.time() - t_start) / len(images)
+                
+                for image in images:
+                    emit(image)
+                generation_times.extend([gen_time] * len(images))
+                
+                memory_governor.check()
+                
+                print(f"  Frame {end}/{num_frames}", end="\r")
+            print()
+        else:
+            for j in range(resume_at, num_frames):
+                combined_output = blend_embeddings(emb1, emb2, schedule, j, j + 1)
+                
+                t_start = time.time()
+                with pipeline_call_guard():
+                    if previous_image is not None:
+                        image = pipe_img2img(
+                            image=previous_image,
+                            width=width,
+                            height=height,
+                            num_inference_steps=num_inference_steps,
+                            guidance_scale=guidance_scale,
+                            strength=denoised_image,
+                            latents=latents[j:j + 1],
+                            **combined_output,
+                        ).images[0]
+                    else:
+                        image = pipe(
+                            width=width,
+                            height=height,
+                            num_inference_steps=num_inference_steps,
+                            guidance_scale=guidance_scale,
+                            latents=latents[j:j + 1],
+                            **combined_output,
+                        ).images[0]
+                gen_time = time.time() - t_start
+                
+                previous_image = image
+                emit(image)
+                generation_times.append(gen_time)
+                
+                memory_governor.check()
+                
+                print(f"  Frame {j+1}/{num_frames}", end="\r")
+            print()
         
+        if checkpoint is not None:
+            checkpoint.finish_transition(i)
+    
+    return results, generation_times, resumed_frames
+
+class VideoEncoder:
+    """Stream frames into ffmpeg as they are produced.
+
+    add_frame() queues a frame and returns; a consumer thread resizes it,
+    optionally saves a PNG copy under frames_dir and writes raw RGB bytes to
+    ffmpeg's stdin, so encoding overlaps with generation. The bounded queue
+    applies back-pressure instead of letting frames pile up in memory.
+    """
+
+    def __init__(self, output_path: str, fps: float = 12, size: int = 512,
+                 frames_dir: Optional[str] = None, queue_size: int = 8):
+        self.output_path = os.path.abspath(output_path)
+        root, ext = os.path.splitext(self.output_path)
+        # ffmpeg writes next to the output and the file is renamed into place when complete
+        self.partial_path = f"{root}.{os.getpid()}-{threading.get_ident()}.partial{ext}"
+        self.fps = fps
+        self.size = size
+        self.frames_dir = os.path.abspath(frames_dir) if frames_dir is not None else None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.process = None
+        self.stderr = None
+        self.thread = None
+        self.error = None
+        self.frame_count = 0
+
+    def start(self) -> 'VideoEncoder':
         ffmpeg_cmd = [
             "ffmpeg", "-y",
-            "-framerate", str(fps),
-            "-i", "frame_%04d.png",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "-s", f"{self.size}x{self.size}",
+            "-framerate", str(self.fps),
+            "-i", "-",
             "-c:v", "libx264",
             "-preset", "medium",
             "-crf", "23",
             "-pix_fmt", "yuv420p",
-            output_path_abs
+            self.partial_path
         ]
-        
-        print(f"\nCreating video {output_path}")
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-        
-        os.chdir(current_dir)
-        
-        if result.returncode == 0:
-            print(f"Video saved successfully to {output_path}")
-        else:
-            print("\nError creating video:")
-            print("STDOUT:", result.stdout)
-            print("STDERR:", result.stderr)
-            raise subprocess.CalledProcessError(result.returncode, ffmpeg_cmd, result.stdout, result.stderr)
-    except subprocess.CalledProcessError as e:
-        print("\nFFmpeg error:")
-        print("STDOUT:", e.stdout)
-        print("STDERR:", e.stderr)
+        try:
+            # stderr goes to a file so a chatty ffmpeg never blocks on a full pipe
+            self.stderr = tempfile.TemporaryFile()
+            self.process = subprocess.Popen(
+                ffmpeg_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr
+            )
+            print(f"\nStreaming video to {self.output_path}")
+        except FileNotFoundError:
+            self.stderr.close()
+            print("\nError: ffmpeg not found. Please install ffmpeg to create videos.")
+            if self.frames_dir is None:
+                self.frames_dir = os.path.splitext(self.output_path)[0] + "_frames"
+            print(f"The individual frames will be saved to {self.frames_dir} and can be used to create a video manually.")
+
+        if self.frames_dir is not None:
+            if os.path.exists(self.frames_dir):
+                shutil.rmtree(self.frames_dir)
+            os.makedirs(self.frames_dir)
+
+        self.thread = threading.Thread(target=self._consume, name='video-encoder', daemon=True)
+        self.thread.start()
+        return self
+
+    def add_frame(self, image: Image.Image):
+        if self.error is not None:
+            raise RuntimeError(f"Video encoding failed: {str(self.error)}")
+        self.queue.put(image)
+
+    def _consume(self):
+        while True:
+            image = self.queue.get()
+            if image is None:
+                return
+            if self.error is not None:
+                # Keep draining so a producer blocked on the queue is released
+                continue
+            try:
+                frame = image.convert('RGB').resize((self.size, self.size), Image.Resampling.LANCZOS)
+                if self.frames_dir is not None:
+                    frame.save(os.path.join(self.frames_dir, f"frame_{self.frame_count:04d}.png"))
+                if self.process is not None:
+                    self.process.stdin.write(frame.tobytes())
+                self.frame_count += 1
+            except Exception as e:
+                self.error = e
+
+    def close(self, abort: bool = False):
+        """Wait for queued frames to be encoded and ffmpeg to finish; abort kills ffmpeg instead."""
+        self.queue.put(None)
+        self.thread.join()
+        if self.process is None:
+            if self.error is not None and not abort:
+                raise self.error
+            return
+
+        if abort:
+            self.process.kill()
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self.process.wait()
+        self.stderr.seek(0)
+        stderr = self.stderr.read().decode(errors='replace')
+        self.stderr.close()
+        if abort or returncode != 0 or self.error is not None:
+            if os.path.exists(self.partial_path):
+                os.remove(self.partial_path)
+        if abort:
+            return
+
+        if returncode != 0 or self.error is not None:
+            print("\nFFmpeg error:")
+            print("STDERR:", stderr)
+            raise subprocess.CalledProcessError(returncode, "ffmpeg", stderr=stderr)
+        os.replace(self.partial_path, self.output_path)
+        print(f"Video saved successfully to {self.output_path}")
+
+def create_interpolation_video(results, output_path='interpolation.mp4', fps=12, size=512, save_frames=False):
+    """Create a video from a sequence of images and optionally save frames."""
+    frames_dir = os.path.splitext(output_path)[0] + "_frames" if save_frames else None
+    encoder = VideoEncoder(output_path, fps=fps, size=size, frames_dir=frames_dir).start()
+    try:
+        for img in results:
+            encoder.add_frame(img)
+    except Exception:
+        encoder.close(abort=True)
         raise
-    except FileNotFoundError:
-        print("\nError: ffmpeg not found. Please install ffmpeg to create videos.")
-        print(f"The individual frames have been saved to {output_dir} and can be used to create a video manually.")
+    encoder.close()
 
 def get_sorted_images(image_dir: str, sort_method: str = 'alpha') -> List[str]:
     """Get sorted list of image paths from directory."""
@@ -673,12 +2037,22 @@ def get_sorted_images(image_dir: str, sort_method: str = 'alpha') -> List[str]:
     else:
         raise ValueError(f"Unknown sort method: {sort_method}")
 
+def timestamp_frame_counts(timestamps: List[float], fps: float) -> Tuple[List[int], List[float]]:
+    """Frames per transition and exact transition lengths in frame intervals."""
+    frames_per_transition = []
+    frame_spans = []
+    for i in range(len(timestamps) - 1):
+        time_diff = timestamps[i+1] - timestamps[i]
+        frames_per_transition.append(max(1, int(round(time_diff * fps)) + 1))
+        frame_spans.append(time_diff * fps)
+    return frames_per_transition, frame_spans
+
 def process_timestamped_images(
     image_paths: List[str],
     timestamps: List[float],
     fps: float,
     pipe: FluxPipeline,
-    pipe_prior_redux: FluxPriorReduxPipeline,
+    pipe_prior_redux: Optional[FluxPriorReduxPipeline],
     height: int = 720,
     width: int = 720,
     noise_blend_amount: float = 0.1,
@@ -686,8 +2060,14 @@ def process_timestamped_images(
     guidance_scale: float = 1.5,
     seed: int = 12345,
     denoised_image: Optional[float] = None,
-    pipe_img2img: Optional[FluxImg2ImgPipeline] = None
-) -> Tuple[List[Image.Image], List[float]]:
+    pipe_img2img: Optional[FluxImg2ImgPipeline] = None,
+    batch_size: Optional[int] = None,
+    easing: str = "slerp",
+    on_frame: Optional[Callable[[Image.Image], None]] = None,
+    checkpoint_dir: Optional[str] = None,
+    initial_image: Optional[Image.Image] = None,
+    keyframe_stride: int = 1
+) -> Tuple[List[Image.Image], List[float], int]:
     """Process images with specific timestamps to create frame sequences."""
     if len(image_paths) != len(timestamps):
         raise ValueError("Number of images must match number of timestamps")
@@ -696,13 +2076,10 @@ def process_timestamped_images(
     if not all(timestamps[i] < timestamps[i+1] for i in range(len(timestamps)-1)):
         raise ValueError("Timestamps must be in ascending order")
     
-    frames_per_transition = []
     print("\nCalculating frame counts:")
-    for i in range(len(timestamps) - 1):
-        time_diff = timestamps[i+1] - timestamps[i]
-        num_frames = int(round(time_diff * fps)) + 1
-        frames_per_transition.append(max(1, num_frames))
-        print(f"  Transition {i}: {time_diff}s * {fps}fps = {num_frames} frames")
+    frames_per_transition, frame_spans = timestamp_frame_counts(timestamps, fps)
+    for i, num_frames in enumerate(frames_per_transition):
+        print(f"  Transition {i}: {timestamps[i+1] - timestamps[i]}s * {fps}fps = {num_frames} frames")
     
     print(f"\nTotal frames to generate: {sum(frames_per_transition)}")
     
@@ -718,7 +2095,14 @@ def process_timestamped_images(
         guidance_scale=guidance_scale,
         seed=seed,
         denoised_image=denoised_image,
-        pipe_img2img=pipe_img2img
+        pipe_img2img=pipe_img2img,
+        batch_size=batch_size,
+        easing=easing,
+        frame_spans=frame_spans,
+        on_frame=on_frame,
+        checkpoint_dir=checkpoint_dir,
+        initial_image=initial_image,
+        keyframe_stride=keyframe_stride
     )
 
 # Keep existing image generation functions and routes
@@ -726,14 +2110,301 @@ def ensure_directory_exists(directory: str) -> None:
     """Create directory if it doesn't exist."""
     Path(directory).mkdir(parents=True, exist_ok=True)
 
-def generate_image(prompt: str, prompt_num: int, fal_key: Optional[str] = None) -> dict:
-    """Generate an image using the fal.ai API and save it locally."""
+_fal_client = None
+
+def get_fal_client() -> httpx.AsyncClient:
+    """Shared async HTTP client for fal.ai calls and image downloads.
+
+    Every generation goes through one connection pool with keep-alive, so
+    requests reuse open connections instead of paying a TCP and TLS
+    handshake each. Pooled connections belong to an event loop, so a new
+    client is made when called from a different loop.
+    """
+    global _fal_client
+    loop = asyncio.get_running_loop()
+    if _fal_client is None or _fal_client[1] is not loop or _fal_client[0].is_closed:
+        client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(FAL_READ_TIMEOUT, connect=FAL_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=FAL_MAX_CONNECTIONS,
+                max_keepalive_connections=FAL_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        _fal_client = (client, loop)
+    return _fal_client[0]
+
+@app.on_event("shutdown")
+async def close_fal_client():
+    """Close the pooled fal.ai connections"""
+    if _fal_client is not None:
+        await _fal_client[0].aclose()
+
+class RateLimiter:
+    """Token bucket with an in-flight cap and adaptive backoff for an external API.
+
+    Calls take a token (refilled at rate per second, up to burst) and an
+    in-flight slot. A throttled or failed call pauses every caller for the
+    backoff delay and halves the rate; each success wins back a tenth of the
+    configured rate, so the limiter settles near what the provider allows.
+    """
+
+    def __init__(self, rate: float, burst: int, max_in_flight: int, min_rate: float = 0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def _take_token(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(max(self.paused_until - now, (1 - self.tokens) / self.rate))
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        async with self.in_flight:
+            await self._take_token()
+            yield
+
+    def backoff(self, delay: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        self.rate = max(self.min_rate, self.rate / 2)
+        metrics.inc("fal_backoffs_total")
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    def get_stats(self) -> dict:
+        return {"rate": self.rate, "max_rate": self.max_rate, "tokens": self.tokens}
+
+_fal_rate_limiter = None
+
+def get_fal_rate_limiter() -> RateLimiter:
+    """Rate limiter shared by all fal.ai calls on the running event loop.
+
+    Its in-flight semaphore belongs to the loop it is first awaited on, so
+    like get_fal_client a new limiter is made when called from another loop.
+    """
+    global _fal_rate_limiter
+    loop = asyncio.get_running_loop()
+    if _fal_rate_limiter is None or _fal_rate_limiter[1] is not loop:
+        _fal_rate_limiter = (RateLimiter(FAL_RATE_LIMIT, FAL_RATE_BURST, FAL_MAX_IN_FLIGHT), loop)
+    return _fal_rate_limiter[0]
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After when given, else exponential with jitter.
+
+    Retry-After may be seconds or an HTTP date, and is capped at FAL_MAX_RETRY_AFTER.
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is not None:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                when = email.utils.parsedate_to_datetime(retry_after)
+                delay = (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(FAL_MAX_RETRY_AFTER, max(0.0, delay))
+    return min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+async def post_fal(url: str, headers: dict, payload: dict) -> httpx.Response:
+    """POST to fal.ai through the rate limiter, retrying 429 and 5xx responses."""
+    client = get_fal_client()
+    rate_limiter = get_fal_rate_limiter()
+    for attempt in range(FAL_MAX_RETRIES + 1):
+        async with rate_limiter.slot():
+            response = await client.post(url, headers=headers, json=payload)
+        if response.status_code != 429 and response.status_code < 500:
+            rate_limiter.succeeded()
+            return response
+        if attempt == FAL_MAX_RETRIES:
+            return response
+        delay = retry_delay(response, attempt)
+        print(f"fal.ai returned {response.status_code}, retrying in {delay:.1f}s")
+        rate_limiter.backoff(delay)
+    return response
+
+class FilenameReserver:
+    """Hand out unique "<base>-<n><ext>" file names in a directory without probing.
+
+    The directory is scanned once for the highest n of every base; after
+    that names are counted up in memory. Each name is claimed by creating
+    an empty placeholder with O_EXCL, so a file made behind our back by
+    another process only costs a retry.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.next_index = None
+        self.lock = threading.Lock()
+
+    def _scan(self) -> Dict[Tuple[str, str], int]:
+        next_index = defaultdict(lambda: 1)
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                base, _, number = stem.rpartition('-')
+                if base and number.isdigit():
+                    next_index[(base, ext)] = max(next_index[(base, ext)], int(number) + 1)
+        return next_index
+
+    def reserve(self, base: str, ext: str) -> str:
+        with self.lock:
+            if self.next_index is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.next_index = self._scan()
+            while True:
+                number = self.next_index[(base, ext)]
+                self.next_index[(base, ext)] = number + 1
+                filename = f"{base}-{number}{ext}"
+                try:
+                    os.close(os.open(os.path.join(self.directory, filename), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    return filename
+                except FileExistsError:
+                    continue
+
+generated_files = FilenameReserver(os.path.join(os.getcwd(), FILES_DIR))
+
+async def download_file(client: httpx.AsyncClient, url: str, path: str, chunk_size: int = 64 * 1024):
+    """Stream url to path in chunks through a temporary file renamed into place when complete."""
+    temp_path = path + '.part'
+    try:
+        async with client.stream('GET', url) as response:
+            response.raise_for_status()
+            with open(temp_path, 'wb') as f:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    f.write(chunk)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+class GenerationCache:
+    """Generated images keyed by a hash of the normalised fal.ai payload.
+
+    Entries expire after ttl seconds, the least recently used go beyond
+    max_entries, and a hit is only served while all its files still exist.
+    Concurrent identical requests share one in-flight generation (single
+    flight), which runs as its own task so a disconnecting client does
+    not cancel it for the others.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        normalised = {**payload, "prompt": " ".join(payload["prompt"].split())}
+        return hashlib.sha256(json.dumps(normalised, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        created, results = entry
+        if time.time() - created > self.ttl or not all(
+            os.path.exists(os.path.join(generated_files.directory, result["filename"])) for result in results
+        ):
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return results
+
+    def put(self, key: str, results: List[dict]):
+        self.entries[key] = (time.time(), results)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            metrics.inc("generation_cache_evictions_total")
+
+    async def get_or_generate(self, key: str, generate: Callable, refresh: bool = False) -> Tuple[List[dict], bool]:
+        """Cached or in-flight results for key, else generate(); returns (results, reused)."""
+        if not refresh:
+            results = self.get(key)
+            if results is not None:
+                metrics.inc("generation_cache_hits_total")
+                return results, True
+            if key in self.in_flight:
+                metrics.inc("generation_cache_coalesced_total")
+                return await asyncio.shield(self.in_flight[key]), True
+        metrics.inc("generation_cache_misses_total")
+        task = asyncio.ensure_future(generate())
+        self.in_flight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+generation_cache = GenerationCache(GENERATION_CACHE_TTL, GENERATION_CACHE_MAX_ENTRIES)
+
+async def fetch_generated_images(url: str, headers: dict, payload: dict, prompt_num: int) -> List[dict]:
+    """Call fal.ai and stream every resulting image into the files directory."""
+    client = get_fal_client()
+    response = await post_fal(url, headers, payload)
+    response.raise_for_status()
+    
+    result = response.json()
+    if 'images' not in result or not result['images']:
+        raise ValueError("No image URL in response")
+    
+    results = []
+    for image_data in result['images']:
+        image_url = image_data['url']
+        
+        # Reserve a filename, then stream the image into it
+        filename = generated_files.reserve(f"image_{prompt_num:03d}", ".jpg")
+        file_path = os.path.join(generated_files.directory, filename)
+        try:
+            await download_file(client, image_url, file_path)
+        except BaseException:
+            os.remove(file_path)
+            raise
+            
+        results.append({
+            "success": True,
+            "prompt_num": prompt_num,
+            "filename": filename,
+            "message": f"Generated and saved image as {filename}"
+        })
+    return results
+
+async def generate_image(prompt: str, prompt_num: int, fal_key: Optional[str] = None,
+                         seed: Optional[int] = None, use_cache: Optional[bool] = None,
+                         occurrence: int = 0) -> dict:
+    """Generate an image using the fal.ai API and save it locally.
+
+    Identical payloads reuse the images of an earlier or in-flight
+    generation (see GenerationCache). Seeded payloads are reused unless
+    use_cache is False, unseeded ones only when use_cache is True;
+    use_cache=False always generates and refreshes the cached entry.
+    occurrence numbers repeats of the same prompt within a batch, which
+    each get their own image.
+    """
     if not fal_key:
         fal_key = os.getenv('FAL_KEY')
         if not fal_key:
             raise ValueError("FAL_KEY not found in environment variables")
 
-    url = "https://fal.run/fal-ai/flux-lora"
+    url = f"{FAL_API_URL}/fal-ai/flux-lora"
     headers = {
         "Authorization": f"Key {fal_key}",
         "Content-Type": "application/json"
@@ -754,81 +2425,66 @@ def generate_image(prompt: str, prompt_num: int, fal_key: Optional[str] = None)
             }
         ]
     }
+    if seed is not None:
+        payload["seed"] = seed + occurrence
     
     try:
-        # Ensure the files directory exists
-        base_dir = os.getcwd()
-        files_dir = os.path.join(base_dir, FILES_DIR)
-        os.makedirs(files_dir, exist_ok=True)
-        
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        
-        result = response.json()
-        if 'images' not in result or not result['images']:
-            raise ValueError("No image URL in response")
-        
-        results = []
-        for idx, image_data in enumerate(result['images']):
-            image_url = image_data['url']
-            
-            # Download the image
-            image_response = requests.get(image_url)
-            image_response.raise_for_status()
-            
-            # Find an available filename
-            base_filename = f"image_{prompt_num:03d}"
-            counter = idx + 1
-            filename = f"{base_filename}-{counter}.jpg"
-            file_path = os.path.join(files_dir, filename)
-            
-            while os.path.exists(file_path):
-                counter += 1
-                filename = f"{base_filename}-{counter}.jpg"
-                file_path = os.path.join(files_dir, filename)
-            
-            # Save the image
-            with open(file_path, 'wb') as f:
-                f.write(image_response.content)
-                
-            results.append({
-                "success": True,
-                "filename": filename,
-                "message": f"Generated and saved image as {filename}"
-            })
+        if use_cache is None and seed is None:
+            results = await fetch_generated_images(url, headers, payload, prompt_num)
+        else:
+            key = generation_cache.key(payload)
+            if seed is None and occurrence:
+                key = f"{key}:{occurrence}"
+            results, reused = await generation_cache.get_or_generate(
+                key,
+                lambda: fetch_generated_images(url, headers, payload, prompt_num),
+                refresh=use_cache is False,
+            )
+            if reused:
+                results = [
+                    {**result, "prompt_num": prompt_num, "cached": True,
+                     "message": f"Reused generated image {result['filename']}"}
+                    for result in results
+                ]
             
         return results[0] if len(results) == 1 else results
             
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"API request failed: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating image: {str(e)}")
 
-async def generate_batch(prompts: Dict[int, str], fal_key: Optional[str] = None) -> list:
-    """Generate images for multiple prompts with rate limiting."""
-    results = []
+def prompt_occurrences(prompts: Dict[int, str]) -> Dict[int, int]:
+    """Number repeats of the same prompt in a batch: 0 for the first, 1 for the next, ..."""
+    seen = {}
+    occurrences = {}
     for prompt_num, prompt in prompts.items():
-        try:
-            result = generate_image(prompt, prompt_num, fal_key)
-            # Handle both single and multiple image results
-            if isinstance(result, list):
-                results.extend(result)
-            else:
-                results.append(result)
-            # Rate limiting
-            await asyncio.sleep(1)
-        except Exception as e:
-            results.append({
-                "success": False,
-                "prompt_num": prompt_num,
-                "error": str(e)
-            })
+        normalised = " ".join(prompt.split())
+        occurrences[prompt_num] = seen.get(normalised, 0)
+        seen[normalised] = occurrences[prompt_num] + 1
+    return occurrences
+
+async def generate_batch(prompts: Dict[int, str], fal_key: Optional[str] = None,
+                         seed: Optional[int] = None, use_cache: Optional[bool] = None) -> list:
+    """Generate images for multiple prompts concurrently, within the fal.ai rate limit."""
+    results = []
+    occurrences = prompt_occurrences(prompts)
+    outputs = await asyncio.gather(*[
+        generate_image_stream(prompt, prompt_num, fal_key, seed, use_cache, occurrences[prompt_num])
+        for prompt_num, prompt in prompts.items()
+    ])
+    for result in outputs:
+        # Handle both single and multiple image results
+        if isinstance(result, list):
+            results.extend(result)
+        else:
+            results.append(result)
     return results
 
 @app.post("/generate")
 async def generate_endpoint(request: GenerateRequest):
     try:
-        return generate_image(request.prompt, request.prompt_num, request.fal_key)
+        return await generate_image(request.prompt, request.prompt_num, request.fal_key, request.seed, request.cache)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -838,16 +2494,18 @@ async def generate_endpoint(request: GenerateRequest):
 async def generate_batch_endpoint(request: BatchGenerateRequest):
     try:
         print(f"Received batch request with prompts: {request.prompts}")
-        results = await generate_batch(request.prompts, request.fal_key)
+        results = await generate_batch(request.prompts, request.fal_key, request.seed, request.cache)
         print(f"Generated batch results: {results}")
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def generate_image_stream(prompt: str, prompt_num: int, fal_key: Optional[str] = None) -> dict:
+async def generate_image_stream(prompt: str, prompt_num: int, fal_key: Optional[str] = None,
+                                seed: Optional[int] = None, use_cache: Optional[bool] = None,
+                                occurrence: int = 0) -> dict:
     """Generate a single image and return it immediately."""
     try:
-        result = generate_image(prompt, prompt_num, fal_key)
+        result = await generate_image(prompt, prompt_num, fal_key, seed, use_cache, occurrence)
         return result
     except Exception as e:
         return {
@@ -856,13 +2514,29 @@ async def generate_image_stream(prompt: str, prompt_num: int, fal_key: Optional[
             "error": str(e)
         }
 
-async def stream_batch_generation(prompts: Dict[int, str], fal_key: Optional[str] = None):
-    """Stream the generation of multiple images."""
-    for prompt_num, prompt in prompts.items():
-        result = await generate_image_stream(prompt, prompt_num, fal_key)
-        yield f"data: {json.dumps(result)}\n\n"
-        await asyncio.sleep(1)  # Rate limiting
-    yield "data: {\"done\": true}\n\n"
+async def stream_batch_generation(prompts: Dict[int, str], fal_key: Optional[str] = None,
+                                  seed: Optional[int] = None, use_cache: Optional[bool] = None):
+    """Stream the generation of multiple images in completion order.
+
+    Prompts run concurrently within the fal.ai rate limit; every result
+    carries its prompt_num. Generations still running when the client
+    disconnects are cancelled.
+    """
+    occurrences = prompt_occurrences(prompts)
+    tasks = [
+        asyncio.ensure_future(
+            generate_image_stream(prompt, prompt_num, fal_key, seed, use_cache, occurrences[prompt_num])
+        )
+        for prompt_num, prompt in prompts.items()
+    ]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            yield f"data: {json.dumps(result)}\n\n"
+        yield "data: {\"done\": true}\n\n"
+    finally:
+        for task in tasks:
+            task.cancel()
 
 @app.post("/generate-batch-stream")
 async def generate_batch_stream_endpoint(request: BatchGenerateRequest):
@@ -874,153 +2548,1115 @@ async def generate_batch_stream_endpoint(request: BatchGenerateRequest):
         "Access-Control-Allow-Origin": "http://localhost:5173"
     }
     return StreamingResponse(
-        stream_batch_generation(request.prompts, request.fal_key),
+        stream_batch_generation(request.prompts, request.fal_key, request.seed, request.cache),
         headers=headers
     )
 
+@app.on_event("startup")
+async def clean_render_checkpoints():
+    """Remove checkpoints left behind by renders that failed or were abandoned long ago"""
+    asyncio.get_running_loop().run_in_executor(
+        None, trim_render_checkpoints, os.path.join(os.getcwd(), RENDERS_DIR), RENDER_CHECKPOINT_MAX_AGE_HOURS * 3600
+    )
+
+@app.on_event("startup")
+async def warm_up_pipelines():
+    """Load the pipelines named in PIPELINE_WARMUP in the background"""
+    if 'lora' in PIPELINE_WARMUP:
+        lora_worker.start()
+    pipelines = [name for name in PIPELINE_WARMUP if name != 'lora']
+    if not pipelines:
+        return
+
+    def warm_up():
+        try:
+            pipeline_registry.warm_up(pipelines)
+        except Exception as e:
+            print(f"Pipeline warm-up failed: {str(e)}")
+
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+@app.get("/pipelines")
+async def get_pipelines():
+    """Get registered and resident model pipelines with their memory use"""
+    return {**pipeline_registry.status(), "embedding_cache": embedding_cache.get_stats()}
+
 # FLUX Interpolation Endpoint
+render_executor = ThreadPoolExecutor(max_workers=RENDER_CONCURRENCY, thread_name_prefix='render')
+# Finished render jobs kept for status and result lookups
+RENDER_JOB_HISTORY = int(os.getenv('RENDER_JOB_HISTORY', '100'))
+
+class RenderCancelled(Exception):
+    """Raised inside a render when its job is cancelled"""
+
+class RenderJob:
+    """One interpolation render and its progress, as seen by the job API."""
+
+    def __init__(self, request: InterpolationRequest, image_paths: List[str], output_path: str, frames_total: int):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.image_paths = image_paths
+        self.output_path = output_path
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.frames_done = 0
+        self.frames_total = frames_total
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.lock = threading.Lock()
+        self.subscribers = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "output_path": self.request.output_path,
+            "preview": self.request.preview,
+            "frames_done": self.frames_done,
+            "frames_total": self.frames_total,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class RenderJobManager:
+    """Queue interpolation renders on the render workers and track them.
+
+    Progress is pushed to subscribers (one asyncio queue per SSE client)
+    from the worker threads with call_soon_threadsafe, so a running render
+    never waits on a slow client and the event loop never waits on a render.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, max_finished: int = 100):
+        self.executor = executor
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, request: InterpolationRequest, image_paths: List[str], output_path: str, frames_total: int) -> RenderJob:
+        job = RenderJob(request, image_paths, output_path, frames_total)
+        with self.lock:
+            # Two renders into one file would corrupt each other's output
+            for other in self.jobs.values():
+                if other.output_path == output_path and not other.done:
+                    raise HTTPException(status_code=409, detail=f"A render to {request.output_path} is already running")
+            self.jobs[job.id] = job
+            self._trim()
+        job.future = self.executor.submit(self._run, job)
+        metrics.inc("render_jobs_submitted_total")
+        return job
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> List[RenderJob]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[RenderJob]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        # A job still waiting for a worker is cancelled right away
+        if job.future is not None and job.future.cancel():
+            self._finish(job, 'cancelled')
+        return job
+
+    def subscribe(self, job: RenderJob, loop: asyncio.AbstractEventLoop) -> Tuple[dict, asyncio.Queue]:
+        """Return the job's current state and a queue receiving every later event."""
+        events = asyncio.Queue()
+        with job.lock:
+            job.subscribers.append((loop, events))
+            return job.to_dict(), events
+
+    def unsubscribe(self, job: RenderJob, events: asyncio.Queue):
+        with job.lock:
+            job.subscribers = [(loop, queue) for loop, queue in job.subscribers if queue is not events]
+
+    def _publish(self, job: RenderJob, **changes):
+        with job.lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            event = job.to_dict()
+            for loop, events in job.subscribers:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def _finish(self, job: RenderJob, status: str, **changes):
+        self._publish(job, status=status, finished=time.time(), **changes)
+        metrics.inc(f"render_jobs_{status}_total")
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    def _run(self, job: RenderJob):
+        if job.cancel_event.is_set():
+            self._finish(job, 'cancelled')
+            return
+        self._publish(job, status='running', started=time.time())
+        print(f"\nRender job {job.id} started: {len(job.image_paths)} images -> {job.output_path}")
+
+        def on_progress(frames_done: int):
+            if job.cancel_event.is_set():
+                raise RenderCancelled()
+            self._publish(job, frames_done=frames_done)
+
+        try:
+            num_frames, generation_times, resumed_frames = run_interpolation(
+                job.request, job.image_paths, job.output_path, on_progress
+            )
+            avg_generation_time = sum(generation_times)/len(generation_times) if generation_times else 0.0
+            # Previews generate every keyframe_stride-th frame and cross-fade the
+            # rest, so counts and timings are per keyframe, not per output frame
+            self._finish(job, 'succeeded', result={
+                "status": "success",
+                "num_images": len(job.image_paths),
+                "num_frames": num_frames,
+                "generated_keyframes": len(generation_times),
+                "resumed_frames": resumed_frames,
+                "avg_keyframe_generation_time": avg_generation_time,
+                # Same value under the name earlier clients read
+                "avg_generation_time": avg_generation_time,
+                "peak_gpu_memory_gb": memory_governor.peak_accelerator_gb(),
+                "output_path": job.request.output_path
+            })
+        except RenderCancelled:
+            print(f"Render job {job.id} cancelled")
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            print(f"Render job {job.id} failed: {str(e)}")
+            self._finish(job, 'failed', error=str(e))
+
+render_jobs = RenderJobManager(render_executor, max_finished=RENDER_JOB_HISTORY)
+
+def request_frames_per_transition(request: InterpolationRequest, num_images: int) -> List[int]:
+    """Frame count of every transition of a request."""
+    if request.timestamps is not None:
+        if len(request.timestamps) != num_images:
+            raise ValueError("Number of images must match number of timestamps")
+        return timestamp_frame_counts(request.timestamps, request.fps)[0]
+    frames_list = parse_frames_list(request.frames)
+    if len(frames_list) == 1:
+        # A single count applies to every transition
+        frames_list = frames_list * (num_images - 1)
+    if len(frames_list) < num_images - 1:
+        raise ValueError(f"Need a frame count for each of the {num_images - 1} transitions")
+    return frames_list[:num_images - 1]
+
+def submit_interpolation(request: InterpolationRequest) -> RenderJob:
+    """Validate an interpolation request and queue it as a render job."""
+    # Get image paths
+    if request.image_paths is None and request.image_dir is not None:
+        image_paths = get_sorted_images(os.path.abspath(request.image_dir), request.sort_method)
+    elif request.image_paths is not None:
+        image_paths = [os.path.abspath(path) for path in request.image_paths]
+    else:
+        raise HTTPException(status_code=400, detail="Must specify either image_paths or image_dir")
+    
+    # Verify images exist
+    for path in image_paths:
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail=f"Image not found: {path}")
+    
+    if len(image_paths) < 2:
+        raise HTTPException(status_code=400, detail="Need at least 2 images to create interpolation")
+    
+    try:
+        frames_per_transition = request_frames_per_transition(request, len(image_paths))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    size, num_inference_steps, keyframe_stride = render_settings(request)
+    if size <= 0 or size % 16 != 0:
+        raise HTTPException(status_code=400, detail="size must be a positive multiple of 16")
+    if num_inference_steps < 1 or keyframe_stride < 1:
+        raise HTTPException(status_code=400, detail="num_inference_steps and keyframe_stride must be at least 1")
+    
+    print("\nProcessing images in order:")
+    for path in image_paths:
+        print(f"  {os.path.basename(path)}")
+    
+    # Renders resolve every path up front and never touch the working
+    # directory, so several can run at once on the render workers
+    output_path = os.path.abspath(request.output_path)
+    return render_jobs.submit(request, image_paths, output_path, sum(frames_per_transition))
+
 @app.post("/interpolate")
 async def interpolate_endpoint(request: InterpolationRequest):
     """Create an interpolation video from a sequence of images."""
     try:
-        # Setup pipelines
-        pipe, pipe_img2img, dtype = setup_pipeline()
-        repo_redux = "black-forest-labs/FLUX.1-Redux-dev"
-        pipe_prior_redux = FluxPriorReduxPipeline.from_pretrained(repo_redux, torch_dtype=dtype)
-        
-        # Add timing decorators
-        pipe = add_timing_to_pipeline(pipe)
-        pipe_prior_redux = add_timing_to_pipeline(pipe_prior_redux)
-        
-        # Get image paths
-        if request.image_paths is None and request.image_dir is not None:
-            image_paths = get_sorted_images(request.image_dir, request.sort_method)
-        elif request.image_paths is not None:
-            image_paths = request.image_paths
-        else:
-            raise HTTPException(status_code=400, detail="Must specify either image_paths or image_dir")
-        
-        # Verify images exist
-        for path in image_paths:
-            if not os.path.exists(path):
-                raise HTTPException(status_code=404, detail=f"Image not found: {path}")
-        
-        if len(image_paths) < 2:
-            raise HTTPException(status_code=400, detail="Need at least 2 images to create interpolation")
-        
-        print("\nProcessing images in order:")
-        for path in image_paths:
-            print(f"  {os.path.basename(path)}")
+        job = submit_interpolation(request)
+        # The render runs on a worker; this request just waits for it
+        await asyncio.wait([asyncio.wrap_future(job.future)])
+        if job.status != 'succeeded':
+            raise HTTPException(status_code=500, detail=job.error or f"Render {job.status}")
+        return job.result
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/interpolate/jobs", status_code=202)
+async def submit_interpolation_job(request: InterpolationRequest):
+    """Queue an interpolation render and return its job id"""
+    try:
+        return submit_interpolation(request).to_dict()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/interpolate/jobs")
+async def list_interpolation_jobs():
+    """List queued, running and recently finished render jobs"""
+    return [job.to_dict() for job in render_jobs.list()]
+
+@app.get("/interpolate/jobs/{job_id}")
+async def get_interpolation_job(job_id: str):
+    """Get the status, progress and result of a render job"""
+    job = render_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/interpolate/jobs/{job_id}")
+async def cancel_interpolation_job(job_id: str):
+    """Cancel a render job; a running render stops after its current frame"""
+    job = render_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.post("/interpolate/jobs/{job_id}/promote", status_code=202)
+async def promote_interpolation_job(job_id: str):
+    """Queue the full-quality render of a preview job to the same output"""
+    job = render_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.request.preview:
+        raise HTTPException(status_code=400, detail="Job is not a preview")
+    try:
+        # Explicit size, steps or stride were chosen for the preview, so the
+        # full render goes back to the full-quality defaults
+        request = job.request.model_copy(update={
+            'preview': False, 'size': None, 'num_inference_steps': None, 'keyframe_stride': None
+        })
+        return submit_interpolation(request).to_dict()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/interpolate/jobs/{job_id}/video")
+async def get_interpolation_job_video(job_id: str):
+    """Download the video of a finished render job"""
+    job = render_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != 'succeeded' or not os.path.exists(job.output_path):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}, no video available")
+    return FileResponse(job.output_path, media_type="video/mp4")
+
+async def stream_job_events(job: RenderJob):
+    """Stream a job's state, then every change until it finishes."""
+    snapshot, events = render_jobs.subscribe(job, asyncio.get_running_loop())
+    try:
+        event = snapshot
+        while True:
+            yield f"data: {json.dumps(event)}\n\n"
+            if event["status"] in ('succeeded', 'failed', 'cancelled'):
+                break
+            event = await events.get()
+    finally:
+        render_jobs.unsubscribe(job, events)
+
+@app.get("/interpolate/jobs/{job_id}/events")
+async def interpolation_job_events(job_id: str):
+    """Stream per-frame progress of a render job as server-sent events"""
+    job = render_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    headers = {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "Access-Control-Allow-Origin": "http://localhost:5173"
+    }
+    return StreamingResponse(stream_job_events(job), headers=headers)
+
+def flux_render_pipelines():
+    """This render's view of the resident FLUX pipelines (see render_pipelines).
+
+    Pipelines stay resident between requests; Redux is only loaded when an
+    image is missing from the embedding cache.
+    """
+    pipe, pipe_img2img, dtype = pipeline_registry.get("flux")
+    return render_pipelines(pipe, pipe_img2img)
+
+class KeyedLocks:
+    """One lock per key, created on first use and dropped once nobody holds or waits for it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    @contextlib.contextmanager
+    def hold(self, key: str):
+        with self.lock:
+            entry = self.locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.locks[key]
+
+# Renders sharing a checkpoint directory or segment clip take turns, so one
+# render never resumes from or removes another's checkpoint while it runs
+render_locks = KeyedLocks()
+
+class PinnedKeys:
+    """Reference counts of keys in use; lock is held while pinning and while evicting."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = defaultdict(int)
+
+    @contextlib.contextmanager
+    def pin(self, keys):
+        keys = set(keys)
+        with self.lock:
+            for key in keys:
+                self.counts[key] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                for key in keys:
+                    self.counts[key] -= 1
+                    if self.counts[key] == 0:
+                        del self.counts[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.counts
+
+# Segments planned by a running render, which trim_segment_cache never evicts
+segment_pins = PinnedKeys()
+
+def run_interpolation(
+    request: InterpolationRequest,
+    image_paths: List[str],
+    output_path: str,
+    on_progress: Optional[Callable[[int], None]] = None
+) -> Tuple[int, List[float], int]:
+    """Render one interpolation request to output_path on a render worker thread.
+
+    on_progress is called with the number of frames done after each frame
+    and may raise to stop the render. With request.resume the frames are
+    checkpointed under RENDERS_DIR until the video is complete, so running
+    the same request again continues where a failed render stopped. With
+    request.segment_cache transitions are rendered as cached clips and
+    stitched together. Returns the number of frames, the generation times
+    of the (key)frames generated by this run and the number of (key)frames
+    loaded from checkpoints.
+    """
+    # Clips can only be cached and stitched with ffmpeg; frame dumps need every frame
+    if request.segment_cache and not request.save_frames and shutil.which("ffmpeg"):
+        return render_segments(request, image_paths, output_path, flux_render_pipelines, on_progress)
+
+    pipe, pipe_img2img = flux_render_pipelines()
+    frames_dir = os.path.splitext(output_path)[0] + "_frames" if request.save_frames else None
+    if not request.resume:
+        frames_done, generation_times, resumed_frames, _ = render_video(
+            request, image_paths, output_path, pipe, pipe_img2img, on_progress, frames_dir=frames_dir
+        )
+        return frames_done, generation_times, resumed_frames
+    checkpoint_dir = render_checkpoint_dir(request, image_paths)
+    with render_locks.hold(checkpoint_dir):
+        frames_done, generation_times, resumed_frames, _ = render_video(
+            request, image_paths, output_path, pipe, pipe_img2img, on_progress,
+            checkpoint_dir=checkpoint_dir, frames_dir=frames_dir
+        )
+    return frames_done, generation_times, resumed_frames
+
+def render_video(
+    request: InterpolationRequest,
+    image_paths: List[str],
+    output_path: str,
+    pipe,
+    pipe_img2img,
+    on_progress: Optional[Callable[[int], None]] = None,
+    checkpoint_dir: Optional[str] = None,
+    frames_dir: Optional[str] = None,
+    initial_image: Optional[Image.Image] = None,
+    frames_before: int = 0
+) -> Tuple[int, List[float], int, Optional[Image.Image]]:
+    """Generate a request's frames straight into a video at output_path.
+
+    Returns the number of frames, the generation times of generated frames,
+    the number of frames loaded from the checkpoint and the last frame.
+    Progress is reported counting from frames_before.
+    """
+    # Frames are encoded while later frames are still being generated
+    encoder = VideoEncoder(output_path, fps=request.fps, frames_dir=frames_dir).start()
+    frames_done = 0
+    last_frame = None
+
+    def on_frame(image: Image.Image):
+        nonlocal frames_done, last_frame
+        encoder.add_frame(image)
+        frames_done += 1
+        last_frame = image
+        if on_progress is not None:
+            on_progress(frames_before + frames_done)
+
+    try:
+        _, generation_times, resumed_frames = render_interpolation(
+            request, image_paths, pipe, None, pipe_img2img, on_frame, checkpoint_dir, initial_image
+        )
+    except BaseException:
+        encoder.close(abort=True)
+        raise
+    encoder.close()
+    if checkpoint_dir is not None:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        trim_render_checkpoints(os.path.dirname(checkpoint_dir), RENDER_CHECKPOINT_MAX_AGE_HOURS * 3600)
+    return frames_done, generation_times, resumed_frames, last_frame
+
+# Request fields that do not change the frames of a render
+NON_FRAME_FIELDS = {'image_paths', 'image_dir', 'sort_method', 'save_frames', 'resume', 'batch_size', 'segment_cache'}
+
+def render_checkpoint_dir(request: InterpolationRequest, image_paths: List[str]) -> str:
+    """Checkpoint directory of a render, keyed by everything that affects its frames."""
+    params = request.model_dump(exclude=NON_FRAME_FIELDS)
+    params['images'] = [embedding_cache.key(path) for path in image_paths]
+    params['model'] = f"{FLUX_REPO}@{FLUX_REVISION}"
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return os.path.join(os.getcwd(), RENDERS_DIR, digest)
+
+def transition_requests(request: InterpolationRequest, image_paths: List[str]) -> List[InterpolationRequest]:
+    """Split a request into one single-transition request per pair of images."""
+    frames_per_transition = request_frames_per_transition(request, len(image_paths))
+    requests_ = []
+    for i, num_frames in enumerate(frames_per_transition):
+        update = {'image_paths': image_paths[i:i + 2], 'image_dir': None, 'frames': str(num_frames)}
         if request.timestamps is not None:
-            # Timestamp-based processing
-            results, generation_times = process_timestamped_images(
-                image_paths=image_paths,
-                timestamps=request.timestamps,
-                fps=request.fps,
-                pipe=pipe,
-                pipe_prior_redux=pipe_prior_redux,
-                noise_blend_amount=request.noise_blend,
-                denoised_image=request.denoised_image,
-                pipe_img2img=pipe_img2img
+            # Only the gap between two keyframes matters, not where they sit on the
+            # timeline; rounding keeps float noise from changing the segment key
+            update['timestamps'] = [0.0, round(request.timestamps[i + 1] - request.timestamps[i], 6)]
+        requests_.append(request.model_copy(update=update))
+    return requests_
+
+def segment_key(request: InterpolationRequest, image_keys: List[str], previous_key: Optional[str]) -> str:
+    """Cache key of a single-transition request's clip."""
+    params = request.model_dump(exclude=NON_FRAME_FIELDS | {'output_path'})
+    params['images'] = image_keys
+    params['model'] = f"{FLUX_REPO}@{FLUX_REVISION}"
+    if request.denoised_image is not None:
+        # img2img segments continue from the previous segment's last frame
+        params['previous'] = previous_key
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+def render_segments(
+    request: InterpolationRequest,
+    image_paths: List[str],
+    output_path: str,
+    get_pipelines: Callable[[], tuple],
+    on_progress: Optional[Callable[[int], None]] = None
+) -> Tuple[int, List[float], int]:
+    """Render each transition as a cached clip and stitch the clips into output_path.
+
+    Transitions whose images, frame count and generation parameters are
+    unchanged reuse their clip, so moving one keyframe only regenerates the
+    two transitions next to it. In img2img mode a segment depends on the one
+    before it, so everything after a change is regenerated. Otherwise
+    missing segments are spread over the shard worker processes when
+    RENDER_SHARDS is set. A transition that occurs several times (A->B,
+    B->A, A->B) is rendered once, and a segment that a concurrent render
+    is working on is waited for and reused.
+
+    get_pipelines returns the (pipe, pipe_img2img) pair and is only called
+    when a segment is rendered in this process, so a fully cached or
+    sharded render never loads the pipelines here.
+    """
+    segments_dir = os.path.join(os.getcwd(), SEGMENTS_DIR)
+    os.makedirs(segments_dir, exist_ok=True)
+    image_keys = list(image_decode_executor.map(embedding_cache.key, image_paths))
+
+    # Segments are pinned before they are checked for, so the cache trim
+    # of a concurrent render cannot evict a clip this render reuses
+    segments = transition_requests(request, image_paths)
+    keys = []
+    previous_key = None
+    for i, segment in enumerate(segments):
+        keys.append(segment_key(segment, image_keys[i:i + 2], previous_key))
+        previous_key = keys[-1]
+    with segment_pins.pin(keys):
+        frames_done, generation_times, resumed_frames = render_planned_segments(
+            request, image_paths, output_path, segments, keys, segments_dir, get_pipelines, on_progress
+        )
+    trim_segment_cache(segments_dir, SEGMENT_CACHE_MAX_MB * 1024 * 1024)
+    return frames_done, generation_times, resumed_frames
+
+def render_planned_segments(
+    request: InterpolationRequest,
+    image_paths: List[str],
+    output_path: str,
+    segments: List[InterpolationRequest],
+    keys: List[str],
+    segments_dir: str,
+    get_pipelines: Callable[[], tuple],
+    on_progress: Optional[Callable[[int], None]] = None
+) -> Tuple[int, List[float], int]:
+    """Render the missing clips of pinned segments and stitch all of them into output_path."""
+    def is_cached(key: str) -> bool:
+        return os.path.exists(os.path.join(segments_dir, key + '.mp4')) and (
+            request.denoised_image is None or os.path.exists(os.path.join(segments_dir, key + '.png'))
+        )
+
+    # (segment request, clip path, checkpoint dir, key, cached) per transition
+    plan = []
+    for segment, key in zip(segments, keys):
+        clip_path = os.path.join(segments_dir, key + '.mp4')
+        checkpoint_dir = os.path.join(os.getcwd(), RENDERS_DIR, key) if request.resume else None
+        plan.append((segment, clip_path, checkpoint_dir, key, is_cached(key)))
+
+    # Each missing segment is rendered once, by its first occurrence
+    first_missing = {}
+    for i, (_, _, _, key, cached) in enumerate(plan):
+        if not cached:
+            first_missing.setdefault(key, i)
+    missing = [plan[i] for i in first_missing.values()]
+    frames_done = 0
+    for i, (segment, clip_path, _, key, cached) in enumerate(plan):
+        if cached:
+            print(f"\nReusing cached segment {i}: {os.path.basename(image_paths[i])} -> {os.path.basename(image_paths[i + 1])}")
+            metrics.inc("segment_cache_hits_total")
+            os.utime(clip_path)
+            frames_done += int(segment.frames)
+        elif first_missing[key] != i:
+            frames_done += int(segment.frames)
+    if on_progress is not None and frames_done:
+        on_progress(frames_done)
+
+    metrics.inc("segment_cache_misses_total", len(missing))
+    shard_pool = get_shard_pool()
+    if shard_pool is not None and request.denoised_image is None and len(missing) > 1:
+        with contextlib.ExitStack() as stack:
+            # Sorted, so renders locking overlapping sets of segments cannot deadlock
+            for key in sorted(first_missing):
+                stack.enter_context(render_locks.hold(key))
+            reused = [entry for entry in missing if is_cached(entry[3])]
+            if reused:
+                frames_done += sum(int(segment.frames) for segment, *_ in reused)
+                if on_progress is not None:
+                    on_progress(frames_done)
+            missing = [entry for entry in missing if entry not in reused]
+            generation_times, resumed_frames = render_segments_sharded(
+                *shard_pool, missing, image_paths, frames_done, on_progress
             )
-        else:
-            # Standard frame-based processing
-            frames_list = parse_frames_list(request.frames)
-            results, generation_times = process_image_batch(
-                image_paths=image_paths,
-                pipe=pipe,
-                pipe_prior_redux=pipe_prior_redux,
-                frames_per_transition=frames_list,
-                noise_blend_amount=request.noise_blend,
-                denoised_image=request.denoised_image,
-                pipe_img2img=pipe_img2img
+        frames_done += sum(int(segment.frames) for segment, *_ in missing)
+    else:
+        generation_times = []
+        resumed_frames = 0
+        pipes = None
+        previous_frame = None
+        previous_key = None
+        for i, (segment, clip_path, checkpoint_dir, key, cached) in enumerate(plan):
+            if cached or first_missing[key] != i:
+                previous_frame = None
+                previous_key = key
+                continue
+            with render_locks.hold(key):
+                if is_cached(key):
+                    # A concurrent render finished this segment while we waited
+                    frames_done += int(segment.frames)
+                    if on_progress is not None:
+                        on_progress(frames_done)
+                    previous_frame = None
+                    previous_key = key
+                    continue
+                if request.denoised_image is not None and previous_frame is None and previous_key is not None:
+                    with Image.open(os.path.join(segments_dir, previous_key + '.png')) as img:
+                        previous_frame = img.convert('RGB')
+                if pipes is None:
+                    pipes = get_pipelines()
+                count, times, resumed, previous_frame = render_video(
+                    segment, segment.image_paths, clip_path, *pipes, on_progress,
+                    checkpoint_dir=checkpoint_dir, initial_image=previous_frame, frames_before=frames_done
+                )
+                if request.denoised_image is not None:
+                    last_frame_path = os.path.join(segments_dir, key + '.png')
+                    previous_frame.save(last_frame_path + '.tmp', format='PNG')
+                    os.replace(last_frame_path + '.tmp', last_frame_path)
+            frames_done += count
+            generation_times.extend(times)
+            resumed_frames += resumed
+            previous_key = key
+
+    concat_clips([clip_path for _, clip_path, *_ in plan], output_path)
+    return frames_done, generation_times, resumed_frames
+
+def render_segments_sharded(pool, shards: int, missing, image_paths, frames_done,
+                            on_progress=None) -> Tuple[List[float], int]:
+    """Render independent segments on pool, which runs shards worker processes.
+
+    One worker first writes every missing embedding to the on-disk cache,
+    so Redux is loaded in at most that worker and never in this process.
+    Progress advances as whole segments finish; cancelling stops segments
+    that have not started yet.
+    """
+    pool.submit(encode_shard_images, image_paths).result()
+    print(f"\nRendering {len(missing)} segments on {shards} shard workers")
+    futures = {
+        pool.submit(render_segment_shard, segment, clip_path, checkpoint_dir): segment
+        for segment, clip_path, checkpoint_dir, _, _ in missing
+    }
+    generation_times = []
+    resumed_frames = 0
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            times, resumed = future.result()
+            generation_times.extend(times)
+            resumed_frames += resumed
+            frames_done += int(futures[future].frames)
+            if on_progress is not None:
+                on_progress(frames_done)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return generation_times, resumed_frames
+
+def encode_shard_images(image_paths: List[str]):
+    """Fill the embedding cache for image_paths inside a shard worker process."""
+    encode_images(image_paths)
+
+def render_segment_shard(segment: InterpolationRequest, clip_path: str, checkpoint_dir: Optional[str]) -> Tuple[List[float], int]:
+    """Render one segment clip inside a shard worker process."""
+    pipe, pipe_img2img, dtype = pipeline_registry.get("flux")
+    _, generation_times, resumed_frames, _ = render_video(
+        segment, segment.image_paths, clip_path, pipe, pipe_img2img, checkpoint_dir=checkpoint_dir
+    )
+    return generation_times, resumed_frames
+
+def init_shard_worker(threads: int):
+    """Prepare a shard worker process: split the CPU threads and load its pipelines."""
+    torch.set_num_threads(threads)
+    pipeline_registry.warm_up(["flux"])
+
+# (pool, number of workers it was made with)
+_shard_pool = None
+_shard_pool_lock = threading.Lock()
+
+def get_shard_pool() -> Optional[Tuple[concurrent.futures.ProcessPoolExecutor, int]]:
+    """Process pool for sharded segment rendering and its worker count, or None when RENDER_SHARDS is 0."""
+    global _shard_pool
+    if RENDER_SHARDS <= 0:
+        return None
+    with _shard_pool_lock:
+        if _shard_pool is None:
+            # spawn, because forking a process that holds torch and CUDA state is unsafe
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=RENDER_SHARDS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_shard_worker,
+                initargs=(max(1, (os.cpu_count() or 1) // RENDER_SHARDS),),
             )
-        
-        # Create video
-        create_interpolation_video(results, request.output_path, fps=request.fps)
-        
-        # Return statistics
-        return {
-            "status": "success",
-            "num_images": len(image_paths),
-            "num_frames": len(results),
-            "avg_generation_time": sum(generation_times)/len(generation_times),
-            "peak_gpu_memory_gb": max_memory_allocated() / 1024**3,
-            "output_path": request.output_path
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+            _shard_pool = (pool, RENDER_SHARDS)
+        return _shard_pool
+
+def concat_clips(clips: List[str], output_path: str):
+    """Join clips into output_path with ffmpeg's concat demuxer, copying the streams."""
+    output_path = os.path.abspath(output_path)
+    root, ext = os.path.splitext(output_path)
+    partial_path = f"{root}.{os.getpid()}-{threading.get_ident()}.partial{ext}"
+    list_path = partial_path + '.txt'
+    with open(list_path, 'w') as f:
+        for clip in clips:
+            escaped = clip.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    concat_cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+    try:
+        print(f"\nStitching {len(clips)} segments into {output_path}")
+        result = subprocess.run(concat_cmd + ["-c", "copy", partial_path], capture_output=True, text=True)
+        if result.returncode != 0:
+            # Clips that cannot be joined as they are get re-encoded
+            print("Stream copy failed, re-encoding segments")
+            result = subprocess.run(concat_cmd + [
+                "-c:v", "libx264", "-preset", "medium", "-crf", "23", "-pix_fmt", "yuv420p", partial_path
+            ], capture_output=True, text=True)
+        if result.returncode != 0:
+            print("\nFFmpeg error:")
+            print("STDERR:", result.stderr)
+            raise subprocess.CalledProcessError(result.returncode, "ffmpeg", result.stdout, result.stderr)
+        os.replace(partial_path, output_path)
+        print(f"Video saved successfully to {output_path}")
+    finally:
+        for path in (list_path, partial_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+def trim_segment_cache(segments_dir: str, max_bytes: int):
+    """Delete the least recently used segment files beyond max_bytes.
+
+    Files still being written (.tmp, .partial) and the segments of running
+    renders (segment_pins) are never deleted, but count toward the total.
+    """
+    with segment_pins.lock:
+        files = []
+        total = 0
+        for entry in os.scandir(segments_dir):
+            if not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            # key.mp4, key.png, key.png.tmp or key.<pid>-<thread>.partial.mp4
+            key = entry.name.split('.', 1)[0]
+            if entry.name.endswith('.tmp') or '.partial' in entry.name or key in segment_pins:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            metrics.inc("segment_cache_evictions_total")
+
+def render_settings(request: InterpolationRequest) -> Tuple[int, int, int]:
+    """Generation size, inference steps and keyframe stride of a request.
+
+    Fields left unset take the preview profile defaults for previews and
+    the full-quality defaults otherwise.
+    """
+    if request.preview:
+        size, steps, stride = PREVIEW_SIZE, PREVIEW_STEPS, PREVIEW_KEYFRAME_STRIDE
+    else:
+        size, steps, stride = 720 if request.timestamps is not None else 1024, 4, 1
+    return (
+        request.size or size,
+        request.num_inference_steps or steps,
+        request.keyframe_stride or stride,
+    )
+
+def render_interpolation(request: InterpolationRequest, image_paths, pipe, pipe_prior_redux, pipe_img2img, on_frame, checkpoint_dir=None, initial_image=None):
+    """Generate the frames of an interpolation request, handing each to on_frame."""
+    size, num_inference_steps, keyframe_stride = render_settings(request)
+    if request.timestamps is not None:
+        # Timestamp-based processing
+        return process_timestamped_images(
+            image_paths=image_paths,
+            timestamps=request.timestamps,
+            fps=request.fps,
+            pipe=pipe,
+            pipe_prior_redux=pipe_prior_redux,
+            height=size,
+            width=size,
+            noise_blend_amount=request.noise_blend,
+            num_inference_steps=num_inference_steps,
+            denoised_image=request.denoised_image,
+            pipe_img2img=pipe_img2img,
+            batch_size=request.batch_size,
+            easing=request.easing,
+            on_frame=on_frame,
+            checkpoint_dir=checkpoint_dir,
+            initial_image=initial_image,
+            keyframe_stride=keyframe_stride
+        )
+    # Standard frame-based processing
+    return process_image_batch(
+        image_paths=image_paths,
+        pipe=pipe,
+        pipe_prior_redux=pipe_prior_redux,
+        frames_per_transition=request_frames_per_transition(request, len(image_paths)),
+        height=size,
+        width=size,
+        noise_blend_amount=request.noise_blend,
+        num_inference_steps=num_inference_steps,
+        denoised_image=request.denoised_image,
+        pipe_img2img=pipe_img2img,
+        batch_size=request.batch_size,
+        easing=request.easing,
+        on_frame=on_frame,
+        checkpoint_dir=checkpoint_dir,
+        initial_image=initial_image,
+        keyframe_stride=keyframe_stride
+    )
 
 # FLUX Lora Pipeline setup and endpoint
-_flux_lora_pipe = None
-
-def get_flux_lora_pipe():
-    """Get or initialize the FLUX Lora pipeline."""
-    global _flux_lora_pipe
-    if _flux_lora_pipe is None:
-        print("Initializing FLUX Lora pipeline...")
-        base_model = "black-forest-labs/FLUX.1-schnell"
-        _flux_lora_pipe = FluxPipeline.from_pretrained(base_model, torch_dtype=torch.bfloat16)
-        
+def load_flux_lora_pipe() -> FluxPipeline:
+    """Load the FLUX base model with the LoRA fused in, quantized when optimum-quanto is available."""
+    print("Initializing FLUX Lora pipeline...")
+    dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float32
+    pipe = FluxPipeline.from_pretrained(LORA_BASE_MODEL, torch_dtype=dtype)
+    
+    if LORA_WEIGHTS:
         print('Loading and fusing lora, please wait...')
-        _flux_lora_pipe.load_lora_weights("./flux_tarot_v1_lora.safetensors")
-        # We need this scaling because SimpleTuner fixes the alpha to 16
-        _flux_lora_pipe.fuse_lora(lora_scale=0.125)
-        _flux_lora_pipe.unload_lora_weights()
-        
+        pipe.load_lora_weights(LORA_WEIGHTS)
+        pipe.fuse_lora(lora_scale=LORA_SCALE)
+        pipe.unload_lora_weights()
+    
+    if LORA_QUANTIZE and quantize is not None:
         print('Quantizing, please wait...')
-        quantize(_flux_lora_pipe.transformer, qfloat8)
-        freeze(_flux_lora_pipe.transformer)
+        quantize(pipe.transformer, qfloat8)
+        freeze(pipe.transformer)
         print('Model quantized!')
-        _flux_lora_pipe.enable_model_cpu_offload()
+    elif LORA_QUANTIZE:
+        print('optimum-quanto is not installed, running the LoRA pipeline unquantized')
+    if torch.cuda.is_available():
+        pipe.enable_model_cpu_offload()
+    return pipe
+
+def lora_batch_shape(params: dict) -> tuple:
+    """Requests with the same shape can be generated in one pipeline call."""
+    return (params['width'], params['height'], params['num_inference_steps'],
+            params['guidance_scale'], params['timestep_to_start_cfg'])
+
+def run_lora_batch(pipe: FluxPipeline, batch: List[Tuple[str, dict]], results):
+    """Generate one image per request in batch and report each result."""
+    params = batch[0][1]
+    # One generator per prompt keeps every image identical to an unbatched run with its seed
+    generators = [
+        torch.Generator().manual_seed(p['seed'] if p['seed'] is not None else random.randrange(2**63))
+        for _, p in batch
+    ]
+    kwargs = dict(
+        prompt=[p['prompt'] for _, p in batch],
+        width=params['width'],
+        height=params['height'],
+        num_inference_steps=params['num_inference_steps'],
+        generator=generators,
+        guidance_scale=params['guidance_scale'],
+    )
+    # Only some FLUX pipelines support delayed CFG
+    if 'timestep_to_start_cfg' in inspect.signature(pipe.__call__).parameters:
+        kwargs['timestep_to_start_cfg'] = params['timestep_to_start_cfg']
+    try:
+        print(f"Generating {len(batch)} LoRA image(s), first prompt: {params['prompt'][:50]}...")
+        images = pipe(**kwargs).images
+        for (request_id, _), image in zip(batch, images):
+            filename = generated_files.reserve("flux_lora", ".png")
+            filepath = os.path.join(FILES_DIR, filename)
+            image.save(os.path.join(generated_files.directory, filename))
+            results.put(('result', request_id, True, {
+                "status": "success",
+                "filename": filename,
+                "filepath": filepath
+            }))
+    except Exception as e:
+        for request_id, _ in batch:
+            results.put(('result', request_id, False, str(e)))
+
+def run_lora_worker(requests_, results):
+    """Entry point of the LoRA worker process.
+
+    Loads the pipeline once and reports ('ready',) or ('failed', error).
+    Requests arrive as (id, params) and are answered with ('result', id,
+    ok, response). Requests queued within LORA_BATCH_WINDOW_MS of each
+    other that share a shape run as one batch of up to LORA_MAX_BATCH.
+    None stops the worker after the queued requests.
+    """
+    try:
+        pipe = load_flux_lora_pipe()
+    except Exception as e:
+        results.put(('failed', str(e)))
+        return
+    results.put(('ready',))
     
-    return _flux_lora_pipe
+    pending = deque()
+    stopping = False
+    while pending or not stopping:
+        if not pending:
+            item = requests_.get()
+            if item is None:
+                break
+            pending.append(item)
+        deadline = time.monotonic() + LORA_BATCH_WINDOW_MS / 1000
+        while not stopping:
+            try:
+                item = requests_.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+            else:
+                pending.append(item)
+        
+        shape = lora_batch_shape(pending[0][1])
+        batch = [item for item in pending if lora_batch_shape(item[1]) == shape][:LORA_MAX_BATCH]
+        for item in batch:
+            pending.remove(item)
+        run_lora_batch(pipe, batch, results)
+
+class LoraWorker:
+    """The FLUX LoRA pipeline in its own process, fed through a request queue.
+
+    Loading, fusing and generating never block the event loop: requests go
+    to the worker over a multiprocessing queue, and a reader thread hands
+    results back to the waiting coroutines. The worker starts at startup
+    when PIPELINE_WARMUP names "lora", otherwise on the first request, and
+    is restarted by the next request if it dies. target is the worker
+    process entry point, run_lora_worker unless a test swaps the pipeline.
+    """
+
+    def __init__(self, target=run_lora_worker):
+        self.target = target
+        self.process = None
+        self.requests = None
+        self.results = None
+        self.state = 'stopped'
+        self.error = None
+        self.started = None
+        self.ready_at = None
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.process is not None and self.process.is_alive():
+                return
+            context = multiprocessing.get_context('spawn')
+            self.requests = context.Queue()
+            self.results = context.Queue()
+            self.process = context.Process(
+                target=self.target, args=(self.requests, self.results), name='lora-worker', daemon=True
+            )
+            self.process.start()
+            self.state = 'loading'
+            self.error = None
+            self.started = time.time()
+            self.ready_at = None
+            threading.Thread(
+                target=self._read_results, args=(self.process, self.results), name='lora-results', daemon=True
+            ).start()
+
+    def _read_results(self, process, results):
+        while True:
+            try:
+                message = results.get(timeout=1)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                if self.process is process and self.state != 'stopped':
+                    # Requests queued after a failed load are answered with the load error
+                    if self.state != 'failed':
+                        print(f"LoRA worker exited with code {process.exitcode}")
+                    self._fail(self.error if self.state == 'failed' else f"LoRA worker exited with code {process.exitcode}")
+                return
+            if message[0] == 'ready':
+                self.state = 'ready'
+                self.ready_at = time.time()
+                print(f"LoRA worker ready in {self.ready_at - self.started:.1f}s")
+            elif message[0] == 'failed':
+                print(f"LoRA pipeline failed to load: {message[1]}")
+                self._fail(f"LoRA pipeline failed to load: {message[1]}")
+            else:
+                _, request_id, ok, response = message
+                self._resolve(request_id, ok, response)
+
+    def _fail(self, error: str):
+        self.state = 'failed'
+        self.error = error
+        for request_id in list(self.pending):
+            self._resolve(request_id, False, error)
+
+    def _resolve(self, request_id: str, ok: bool, response):
+        entry = self.pending.pop(request_id, None)
+        if entry is None:
+            return
+        loop, future = entry
+
+        def settle():
+            if future.done():
+                return
+            if ok:
+                future.set_result(response)
+            else:
+                future.set_exception(RuntimeError(response))
+
+        loop.call_soon_threadsafe(settle)
+
+    async def generate(self, request: FluxLoraRequest) -> dict:
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request_id = uuid.uuid4().hex
+        self.pending[request_id] = (loop, future)
+        self.requests.put((request_id, request.model_dump()))
+        try:
+            return await future
+        finally:
+            self.pending.pop(request_id, None)
+
+    def stop(self, timeout: float = 10):
+        with self.lock:
+            if self.process is None:
+                return
+            self.state = 'stopped'
+            self.requests.put(None)
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+
+    def status(self) -> dict:
+        process = self.process
+        return {
+            "state": self.state,
+            "alive": process is not None and process.is_alive(),
+            "pid": process.pid if process is not None else None,
+            "pending": len(self.pending),
+            "load_seconds": self.ready_at - self.started if self.ready_at else None,
+            "error": self.error,
+        }
+
+lora_worker = LoraWorker()
+
+@app.on_event("shutdown")
+async def stop_lora_worker():
+    """Stop the LoRA worker process"""
+    await asyncio.get_running_loop().run_in_executor(None, lora_worker.stop)
+
+@app.get("/generate-lora/health")
+async def lora_health():
+    """Report the LoRA worker's state"""
+    return lora_worker.status()
+
+@app.get("/generate-lora/ready")
+async def lora_ready():
+    """Readiness check: 200 once the LoRA pipeline is loaded, 503 before"""
+    status = lora_worker.status()
+    if status["state"] != 'ready' or not status["alive"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
 
 @app.post("/generate-lora")
 async def generate_lora_endpoint(request: FluxLoraRequest):
     """Generate a single image using FLUX Lora."""
     try:
-        # Get or initialize the pipeline
-        pipe = get_flux_lora_pipe()
-        
-        # Setup generator with seed if provided
-        if request.seed is not None:
-            generator = torch.Generator().manual_seed(request.seed)
-        else:
-            generator = None
-        
-        # Generate image
-        print(f"Generating image with prompt: {request.prompt[:50]}...")
-        image = pipe(
-            prompt=request.prompt,
-            width=request.width,
-            height=request.height,
-            num_inference_steps=request.num_inference_steps,
-            generator=generator,
-            guidance_scale=request.guidance_scale,
-            timestep_to_start_cfg=request.timestep_to_start_cfg,
-        ).images[0]
-        
-        # Save image to a temporary file
-        output_dir = os.path.join(DATA_DIR, 'files')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Generate a unique filename
-        timestamp = int(time.time() * 1000)
-        filename = f"flux_lora_{timestamp}.png"
-        filepath = os.path.join(output_dir, filename)
-        
-        # Save the image
-        image.save(filepath)
-        
-        return {
-            "status": "success",
-            "filename": filename,
-            "filepath": filepath
-        }
-        
+        return await lora_worker.generate(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
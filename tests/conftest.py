@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'workflows'))
+
+import stubs
+
+
+@pytest.fixture(scope='session')
+def server(tmp_path_factory):
+    # The server resolves some of its data directories on import
+    os.chdir(tmp_path_factory.mktemp('server'))
+    import server
+    return server
+
+
+@pytest.fixture
+def monitor(server, tmp_path, monkeypatch):
+    """Stub pipelines and embeddings for one test, rendering under its own data directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(server, 'encode_images', stubs.stub_encode_images)
+    monkeypatch.setattr(server, 'INTERPOLATION_BATCH_SIZE', 1)
+    monitor = stubs.PipelineMonitor()
+    stubs.register_stub_pipelines(server, monitor)
+    yield monitor
+    monitor.gate.set()
+
+
+@pytest.fixture
+def images(tmp_path):
+    return [
+        stubs.make_image(tmp_path / f'image{i}.png', colour)
+        for i, colour in enumerate([(200, 30, 30), (30, 200, 30), (30, 30, 200), (200, 200, 30)])
+    ]
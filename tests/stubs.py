@@ -0,0 +1,196 @@
+"""Stand-ins for the FLUX and Redux pipelines, small enough to render on CPU in tests."""
+import shutil
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg is not installed")
+
+
+class PipelineMonitor:
+    """Shared by a stub pipeline and its per-render copies: counts calls, can hold or fail them."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.fail_at = None
+
+
+class StubFluxPipeline:
+    """Turns each row of latents plus embeddings into a flat-coloured image.
+
+    Frames depend only on their inputs, so a resumed or sharded render must
+    produce exactly the frames of an uninterrupted serial one.
+    """
+
+    def __init__(self, monitor: PipelineMonitor = None):
+        self.monitor = monitor or PipelineMonitor()
+        self.transformer = SimpleNamespace(config=SimpleNamespace(in_channels=16))
+        self.scheduler = SimpleNamespace()
+        self.dtype = torch.float32
+        self.device = torch.device('cpu')
+
+    def prepare_latents(self, batch_size, num_channels_latents, height, width, dtype, device, generator):
+        latents = torch.randn((batch_size, 4, num_channels_latents), generator=generator, dtype=dtype)
+        return latents.to(device), None
+
+    def __call__(self, latents, prompt_embeds, pooled_prompt_embeds, image=None, strength=None, **kwargs):
+        monitor = self.monitor
+        with monitor.lock:
+            monitor.calls += 1
+            call = monitor.calls
+            monitor.active += 1
+            monitor.peak = max(monitor.peak, monitor.active)
+        try:
+            monitor.gate.wait(timeout=30)
+            if monitor.fail_at is not None and call >= monitor.fail_at:
+                raise RuntimeError(f"stub pipeline failed on call {call}")
+            images = []
+            for i in range(latents.shape[0]):
+                values = torch.stack([
+                    latents[i].mean(), prompt_embeds[i].mean(), pooled_prompt_embeds[i].mean()
+                ])
+                colour = ((torch.sigmoid(values * 4) * 255).round().to(torch.uint8)).tolist()
+                if image is not None:
+                    colour = [(c + p) // 2 for c, p in zip(colour, image.getpixel((0, 0)))]
+                images.append(Image.new('RGB', (16, 16), tuple(colour)))
+            return SimpleNamespace(images=images)
+        finally:
+            with monitor.lock:
+                monitor.active -= 1
+
+
+def stub_encode_images(image_paths, pipe_prior_redux=None):
+    """encode_images without Redux: embeddings derived from each image's cache key."""
+    import server
+    keys = [server.embedding_cache.key(path) for path in image_paths]
+    encoded_images = {}
+    for key in keys:
+        generator = torch.Generator().manual_seed(int(key[:12], 16))
+        encoded_images[key] = {
+            'prompt_embeds': torch.randn(1, 8, 32, generator=generator),
+            'pooled_prompt_embeds': torch.randn(1, 32, generator=generator),
+        }
+    return keys, encoded_images
+
+
+def register_stub_pipelines(server, monitor: PipelineMonitor):
+    pipe = StubFluxPipeline(monitor)
+    server.pipeline_registry.register("flux", lambda: (pipe, StubFluxPipeline(monitor), pipe.dtype))
+
+
+def init_stub_shard_worker(threads: int):
+    """Shard pool initializer that loads the stubs instead of the real pipelines."""
+    import server
+    register_stub_pipelines(server, PipelineMonitor())
+    server.encode_images = stub_encode_images
+    server.init_shard_worker(threads)
+
+
+def make_image(path, colour):
+    Image.fromarray(np.full((32, 32, 3), colour, dtype=np.uint8)).save(path)
+    return str(path)
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        value = condition()
+        if value:
+            return value
+        time.sleep(0.02)
+    raise AssertionError("timed out waiting for condition")
+
+
+class StubLoraPipeline:
+    """Stands in for the fused LoRA pipeline: one flat image per prompt, coloured by its generator.
+
+    A prompt of "fail" makes the whole call raise, like a pipeline error would.
+    """
+
+    def __call__(self, prompt, width, height, num_inference_steps, generator, guidance_scale):
+        if 'fail' in prompt:
+            raise RuntimeError("stub LoRA pipeline failed")
+        images = []
+        for g in generator:
+            colour = tuple(torch.randint(0, 256, (3,), generator=g).tolist())
+            images.append(Image.new('RGB', (width, height), colour))
+        return SimpleNamespace(images=images)
+
+
+def run_stub_lora_worker(requests_, results):
+    """LoRA worker entry point that loads the stub pipeline."""
+    import server
+    server.load_flux_lora_pipe = StubLoraPipeline
+    server.run_lora_worker(requests_, results)
+
+
+def run_broken_lora_worker(requests_, results):
+    """LoRA worker entry point whose pipeline fails to load."""
+    import server
+
+    def load():
+        raise OSError("no such model")
+    server.load_flux_lora_pipe = load
+    server.run_lora_worker(requests_, results)
+
+
+class FakeFal:
+    """Local stand-in for fal.ai over real sockets.
+
+    POSTs are answered with the next (status, headers) in statuses, then
+    200 with one image that GET serves. Every request is recorded as
+    (method, path, client port), so tests can see which connection it used.
+    """
+
+    def __init__(self):
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        fake = self
+        self.statuses = []
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                fake.requests.append(('POST', self.path, self.client_address[1]))
+                if fake.statuses:
+                    status, headers = fake.statuses.pop(0)
+                    self.reply(status, b'{"detail": "scripted"}', headers.items())
+                else:
+                    body = {'images': [{'url': f'{fake.url}/images/{len(fake.requests)}.jpg'}]}
+                    self.reply(200, json.dumps(body).encode(), [('Content-Type', 'application/json')])
+
+            def do_GET(self):
+                fake.requests.append(('GET', self.path, self.client_address[1]))
+                self.reply(200, self.path.encode())
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import email.utils
+import os
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import stubs
+
+
+@pytest.fixture
+def fal(server, monkeypatch):
+    fake = stubs.FakeFal()
+    monkeypatch.setattr(server, 'FAL_API_URL', fake.url)
+    monkeypatch.setenv('FAL_KEY', 'test-key')
+    yield fake
+    fake.close()
+
+
+def run(server, coroutine):
+    """Run coroutine on a fresh event loop, closing the pooled client it opened."""
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await server.close_fal_client()
+    return asyncio.run(main())
+
+
+def test_generations_reuse_one_pooled_connection(server, fal):
+    async def generate_three():
+        client = server.get_fal_client()
+        results = [await server.generate_image(f'card {i}', i) for i in range(3)]
+        assert server.get_fal_client() is client
+        return client, results
+
+    client, results = run(server, generate_three())
+    assert [method for method, _, _ in fal.requests] == ['POST', 'GET'] * 3
+    # Posts and image downloads all went over one keep-alive connection
+    assert len({port for _, _, port in fal.requests}) == 1
+    for result, (_, path, _) in zip(results, fal.requests[1::2]):
+        with open(os.path.join(server.generated_files.directory, result['filename']), 'rb') as f:
+            assert f.read() == path.encode()
+
+    # Pooled connections belong to their loop, so another loop gets its own client
+    other, _ = run(server, generate_three())
+    assert other is not client and client.is_closed
+
+
+@pytest.mark.parametrize('status, detail', [
+    (400, "API request failed: Client error '400 Bad Request'"),
+    (404, "API request failed: Client error '404 Not Found'"),
+])
+def test_fal_client_errors_become_500s(server, fal, status, detail):
+    fal.statuses.append((status, {}))
+    with pytest.raises(HTTPException) as error:
+        run(server, server.generate_image('card', 1))
+    assert error.value.status_code == 500
+    assert error.value.detail.startswith(detail)
+    # Client errors are not retried
+    assert len(fal.requests) == 1
+
+
+def test_unreachable_fal_becomes_500(server, fal):
+    fal.close()
+    with pytest.raises(HTTPException) as error:
+        run(server, server.generate_image('card', 1))
+    assert error.value.status_code == 500
+    assert error.value.detail.startswith("API request failed: ")
+
+
+def test_token_bucket_paces_calls_and_caps_in_flight(server):
+    async def take(limiter, count, hold=0.0):
+        start = time.monotonic()
+        active, peak, times = 0, 0, []
+
+        async def call():
+            nonlocal active, peak
+            async with limiter.slot():
+                times.append(time.monotonic() - start)
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(hold)
+                active -= 1
+        await asyncio.gather(*[call() for _ in range(count)])
+        return sorted(times), peak
+
+    # A burst of 2 goes at once, then one call per 1/rate seconds
+    times, _ = asyncio.run(take(server.RateLimiter(rate=10, burst=2, max_in_flight=8), 4))
+    assert times[1] < 0.05
+    assert 0.08 < times[2] < 0.2 and 0.18 < times[3] < 0.3
+
+    _, peak = asyncio.run(take(server.RateLimiter(rate=1000, burst=100, max_in_flight=2), 6, hold=0.02))
+    assert peak == 2
+
+
+def test_rate_limiter_is_made_per_event_loop(server, monkeypatch):
+    monkeypatch.setattr(server, 'FAL_MAX_IN_FLIGHT', 1)
+
+    async def contend():
+        limiter = server.get_fal_rate_limiter()
+
+        async def call():
+            async with limiter.slot():
+                await asyncio.sleep(0.01)
+        # Waiting on the semaphore binds it to this loop
+        await asyncio.gather(call(), call())
+        return limiter
+
+    assert asyncio.run(contend()) is not asyncio.run(contend())
+
+
+def test_throttled_and_failed_calls_are_retried(server, fal):
+    fal.statuses += [(429, {'Retry-After': '0.3'}), (503, {'Retry-After': '0'})]
+    backoffs = server.metrics.counters['fal_backoffs_total']
+
+    async def generate():
+        start = time.monotonic()
+        result = await server.generate_image('card', 1)
+        return result, time.monotonic() - start, server.get_fal_rate_limiter()
+
+    result, elapsed, limiter = run(server, generate())
+    assert result['success']
+    assert [method for method, _, _ in fal.requests] == ['POST', 'POST', 'POST', 'GET']
+    # Everyone waited out Retry-After, and the rate was halved per backoff then recovered a tenth
+    assert elapsed >= 0.3
+    assert server.metrics.counters['fal_backoffs_total'] == backoffs + 2
+    assert limiter.rate == pytest.approx(limiter.max_rate * 0.35)
+
+
+def test_retries_give_up_after_fal_max_retries(server, fal, monkeypatch):
+    monkeypatch.setattr(server, 'FAL_MAX_RETRIES', 1)
+    fal.statuses += [(500, {'Retry-After': '0'})] * 3
+    with pytest.raises(HTTPException) as error:
+        run(server, server.generate_image('card', 1))
+    assert error.value.detail.startswith("API request failed: Server error '500 Internal Server Error'")
+    assert len(fal.requests) == 2
+
+
+@pytest.mark.parametrize('retry_after, low, high', [
+    ('2.5', 2.5, 2.5),
+    ('-1', 0, 0),
+    # Long waits are capped at FAL_MAX_RETRY_AFTER
+    ('86400', 60, 60),
+    # HTTP dates, given here as the time from now
+    (datetime.timedelta(hours=1), 60, 60),
+    (datetime.timedelta(seconds=30), 25, 30),
+    # Unparseable values fall back to backoff with jitter: 2 ** attempt halved at most
+    ('soon', 2, 4),
+])
+def test_retry_delay_honours_and_caps_retry_after(server, monkeypatch, retry_after, low, high):
+    monkeypatch.setattr(server, 'FAL_MAX_RETRY_AFTER', 60.0)
+    if isinstance(retry_after, datetime.timedelta):
+        retry_after = email.utils.format_datetime(datetime.datetime.now(datetime.timezone.utc) + retry_after, usegmt=True)
+    response = httpx.Response(429, headers={'Retry-After': retry_after})
+    assert low <= server.retry_delay(response, attempt=2) <= high
@@ -0,0 +1,192 @@
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import stubs
+from stubs import requires_ffmpeg, wait_for
+
+
+@pytest.fixture
+def client(server):
+    return TestClient(server.app)
+
+
+def submit(client, image_paths, output_path, **fields):
+    return client.post('/interpolate/jobs', json={
+        'image_paths': image_paths, 'output_path': str(output_path), 'frames': '4', 'fps': 8, **fields
+    })
+
+
+def job_status(client, job_id):
+    return client.get(f'/interpolate/jobs/{job_id}').json()
+
+
+class StopRender(Exception):
+    pass
+
+
+def wait_until_finished(client, job_id):
+    def finished():
+        job = job_status(client, job_id)
+        return job if job['status'] in ('succeeded', 'failed', 'cancelled') else None
+    return wait_for(finished)
+
+
+def decode_frames(path):
+    capture = cv2.VideoCapture(str(path))
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            capture.release()
+            return frames
+        frames.append(frame)
+
+
+@requires_ffmpeg
+def test_concurrent_jobs_render_side_by_side(client, monitor, images, tmp_path):
+    # Without the segment cache the renders alone below generate every frame again
+    monitor.gate.clear()
+    first = submit(client, images[:2], tmp_path / 'first.mp4', segment_cache=False, resume=False)
+    second = submit(client, images[2:], tmp_path / 'second.mp4', segment_cache=False, resume=False)
+    assert first.status_code == 202 and second.status_code == 202
+
+    # Both renders are inside a pipeline call at the same time
+    wait_for(lambda: monitor.active == 2)
+    assert job_status(client, first.json()['job_id'])['status'] == 'running'
+    assert job_status(client, second.json()['job_id'])['status'] == 'running'
+
+    monitor.gate.set()
+    for response in (first, second):
+        job = wait_until_finished(client, response.json()['job_id'])
+        assert job['status'] == 'succeeded', job['error']
+        assert job['result']['num_frames'] == 4
+
+    # The same jobs rendered one at a time give exactly the same videos
+    for image_paths, name in ((images[:2], 'first'), (images[2:], 'second')):
+        alone = submit(client, image_paths, tmp_path / f'{name}_alone.mp4', segment_cache=False, resume=False)
+        assert wait_until_finished(client, alone.json()['job_id'])['status'] == 'succeeded'
+        together = decode_frames(tmp_path / f'{name}.mp4')
+        expected = decode_frames(tmp_path / f'{name}_alone.mp4')
+        assert len(together) == len(expected) == 4
+        assert all(np.array_equal(frame, want) for frame, want in zip(together, expected))
+    assert not np.array_equal(decode_frames(tmp_path / 'first.mp4')[1], decode_frames(tmp_path / 'second.mp4')[1])
+
+
+@requires_ffmpeg
+def test_duplicate_output_path_is_rejected_while_rendering(client, monitor, images, tmp_path):
+    monitor.gate.clear()
+    first = submit(client, images[:2], tmp_path / 'out.mp4')
+    assert first.status_code == 202
+
+    duplicate = submit(client, images[2:], tmp_path / 'out.mp4')
+    assert duplicate.status_code == 409
+
+    monitor.gate.set()
+    assert wait_until_finished(client, first.json()['job_id'])['status'] == 'succeeded'
+    # Once the first render is done the output path is free again
+    again = submit(client, images[2:], tmp_path / 'out.mp4')
+    assert again.status_code == 202
+    assert wait_until_finished(client, again.json()['job_id'])['status'] == 'succeeded'
+
+
+@requires_ffmpeg
+def test_cancel_stops_a_running_job(client, monitor, images, tmp_path):
+    monitor.gate.clear()
+    response = submit(client, images[:2], tmp_path / 'cancelled.mp4', frames='8', segment_cache=False)
+    job_id = response.json()['job_id']
+    wait_for(lambda: monitor.active == 1)
+
+    assert client.delete(f'/interpolate/jobs/{job_id}').status_code == 200
+    monitor.gate.set()
+    job = wait_until_finished(client, job_id)
+    assert job['status'] == 'cancelled'
+    assert monitor.calls < 8
+    assert not os.path.exists(tmp_path / 'cancelled.mp4')
+    assert client.delete('/interpolate/jobs/unknown').status_code == 404
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('preview, frames, fail_at, resumed, generated', [
+    (False, '8', 4, 3, 5),
+    # 9 frames at the preview stride of 4 are 3 keyframes
+    (True, '9', 2, 1, 2),
+])
+def test_rerun_resumes_from_checkpoint(client, monitor, images, tmp_path, preview, frames, fail_at, resumed, generated):
+    fields = {'frames': frames, 'segment_cache': False, 'preview': preview, 'keyframe_stride': 4 if preview else None}
+    monitor.fail_at = fail_at
+    failed = wait_until_finished(client, submit(client, images[:2], tmp_path / 'out.mp4', **fields).json()['job_id'])
+    assert failed['status'] == 'failed'
+
+    monitor.fail_at = None
+    job = wait_until_finished(client, submit(client, images[:2], tmp_path / 'out.mp4', **fields).json()['job_id'])
+    assert job['status'] == 'succeeded', job['error']
+    assert job['result']['num_frames'] == int(frames)
+    assert job['result']['resumed_frames'] == resumed
+    assert job['result']['generated_keyframes'] == generated
+
+
+@pytest.mark.parametrize('denoised_image', [None, 0.5])
+def test_resumed_frames_match_an_uninterrupted_render(server, monitor, images, tmp_path, denoised_image):
+    pipe, pipe_img2img, _ = server.pipeline_registry.get("flux")
+
+    def render(checkpoint_dir=None, stop_after=None):
+        frames = []
+
+        def on_frame(image):
+            frames.append(np.asarray(image))
+            if len(frames) == stop_after:
+                raise StopRender
+
+        _, generation_times, resumed_frames = server.process_image_batch(
+            images[:3], pipe, None, [5, 5], height=32, width=32, batch_size=2,
+            denoised_image=denoised_image, pipe_img2img=pipe_img2img,
+            on_frame=on_frame, checkpoint_dir=checkpoint_dir
+        )
+        return frames, len(generation_times), resumed_frames
+
+    expected, _, _ = render()
+    with pytest.raises(StopRender):
+        render(str(tmp_path / 'checkpoint'), stop_after=7)
+    frames, generated, resumed_frames = render(str(tmp_path / 'checkpoint'))
+
+    assert resumed_frames == 7
+    assert generated == 3
+    assert len(frames) == len(expected) == 10
+    assert all(np.array_equal(frame, want) for frame, want in zip(frames, expected))
+
+
+def test_stale_checkpoints_are_removed(server, tmp_path):
+    renders_dir = tmp_path / 'renders'
+    for name in ('stale', 'fresh'):
+        checkpoint = server.RenderCheckpoint(str(renders_dir / name), batch_size=1)
+        checkpoint.save_frame(0, stubs.Image.new('RGB', (8, 8), (1, 2, 3)))
+    os.utime(renders_dir / 'stale', (0, time.time() - 7200))
+
+    server.trim_render_checkpoints(str(renders_dir), max_age=3600)
+    assert sorted(os.listdir(renders_dir)) == ['fresh']
+    assert server.RenderCheckpoint(str(renders_dir / 'fresh'), 1).load_frame(0).getpixel((0, 0)) == (1, 2, 3)
+
+
+def test_blend_schedules_are_shared_across_renders(server, monitor, images, monkeypatch):
+    pipe, _, _ = server.pipeline_registry.get("flux")
+    monkeypatch.setattr(server, 'blend_schedules', server.BlendScheduleCache(max_entries=2))
+
+    def render(image_paths, easing='linear'):
+        server.process_image_batch(image_paths, pipe, None, [3], height=32, width=32, easing=easing)
+
+    misses = server.metrics.counters['blend_schedule_cache_misses_total']
+    render(images[:2])
+    render(images[:2])
+    assert server.metrics.counters['blend_schedule_cache_misses_total'] == misses + 1
+
+    # A different easing needs its own schedule, and the oldest entry is dropped past max_entries
+    render(images[:2], easing='cosine')
+    render(images[2:])
+    assert len(server.blend_schedules.entries) == 2
+    render(images[:2])
+    assert server.metrics.counters['blend_schedule_cache_misses_total'] == misses + 4
@@ -0,0 +1,88 @@
+import concurrent.futures
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import stubs
+from stubs import wait_for
+
+
+@pytest.fixture
+def lora_worker(server, tmp_path, monkeypatch):
+    # The worker process saves images under the directory it starts in
+    monkeypatch.chdir(tmp_path)
+
+    def make(target=stubs.run_stub_lora_worker):
+        worker = server.LoraWorker(target)
+        monkeypatch.setattr(server, 'lora_worker', worker)
+        workers.append(worker)
+        return worker
+
+    workers = []
+    yield make
+    for worker in workers:
+        worker.stop()
+
+
+@pytest.fixture
+def client(server):
+    return TestClient(server.app)
+
+
+def generate(client, prompt, seed):
+    return client.post('/generate-lora', json={'prompt': prompt, 'width': 16, 'height': 16, 'seed': seed})
+
+
+def load_image(tmp_path, response):
+    assert response.status_code == 200, response.text
+    return np.asarray(Image.open(tmp_path / response.json()['filepath']))
+
+
+def test_lora_worker_generates_and_reports_errors(client, lora_worker, tmp_path):
+    worker = lora_worker()
+    assert client.get('/generate-lora/ready').status_code == 503
+
+    # Concurrent requests may be batched, but each image still depends only on its seed
+    with concurrent.futures.ThreadPoolExecutor(3) as pool:
+        responses = list(pool.map(lambda seed: generate(client, f'card {seed}', seed), [1, 2, 3]))
+    batched = [load_image(tmp_path, response) for response in responses]
+    assert len({response.json()['filename'] for response in responses}) == 3
+    assert np.array_equal(batched[1], load_image(tmp_path, generate(client, 'card 2', 2)))
+    assert not np.array_equal(batched[0], batched[1])
+
+    failed = generate(client, 'fail', 4)
+    assert failed.status_code == 500
+    assert failed.json()['detail'] == "stub LoRA pipeline failed"
+
+    # A failed batch leaves the worker serving
+    health = client.get('/generate-lora/health').json()
+    assert health['state'] == 'ready' and health['alive'] and health['pending'] == 0
+    assert health['pid'] == worker.process.pid != os.getpid()
+    assert client.get('/generate-lora/ready').status_code == 200
+
+
+def test_lora_worker_restarts_after_it_dies(client, lora_worker, tmp_path):
+    worker = lora_worker()
+    load_image(tmp_path, generate(client, 'card', 1))
+    first_pid = worker.process.pid
+
+    worker.process.kill()
+    wait_for(lambda: worker.state == 'failed')
+    assert client.get('/generate-lora/ready').status_code == 503
+    assert client.get('/generate-lora/health').json()['error'].startswith("LoRA worker exited with code")
+
+    # The next request starts a new worker
+    load_image(tmp_path, generate(client, 'card', 1))
+    assert worker.process.pid != first_pid
+    assert client.get('/generate-lora/health').json()['state'] == 'ready'
+
+
+def test_lora_worker_load_failure_reaches_requests(client, lora_worker):
+    lora_worker(stubs.run_broken_lora_worker)
+    response = generate(client, 'card', 1)
+    assert response.status_code == 500
+    assert response.json()['detail'] == "LoRA pipeline failed to load: no such model"
+    assert client.get('/generate-lora/health').json()['state'] == 'failed'
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+
+@pytest.fixture(params=['files', 'sqlite'])
+def open_store(server, request, tmp_path):
+    """Open the node store under test; called again it reopens the same data."""
+    def open_store():
+        if request.param == 'files':
+            return server.FileNodeStore(str(tmp_path / 'nodes'))
+        return server.SQLiteNodeStore(str(tmp_path / 'nodes.db'))
+    return open_store
+
+
+class GatedStore:
+    """Wraps a node store so writes wait until the gate is opened."""
+
+    def __init__(self, store):
+        self.store = store
+        self.gate = threading.Event()
+        self.gate.set()
+        # Names of the threads each store call ran on
+        self.threads = []
+
+    def load(self, node_name):
+        self.threads.append(threading.current_thread().name)
+        return self.store.load(node_name)
+
+    def write_batch(self, items):
+        self.threads.append(threading.current_thread().name)
+        assert self.gate.wait(timeout=10)
+        return self.store.write_batch(items)
+
+    def delete(self, node_name):
+        self.threads.append(threading.current_thread().name)
+        self.store.delete(node_name)
+
+    def close(self):
+        self.threads.append(threading.current_thread().name)
+        self.store.close()
+
+
+async def settle(condition, timeout=10):
+    """Await condition while the flusher runs on this loop."""
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out waiting for condition")
+
+
+def test_stop_flushes_pending_writes(server, open_store):
+    async def main():
+        cache = server.NodeCache(open_store(), write_delay=60)
+        await cache.set('a', {'v': 1})
+        # The first write is immediate, later ones wait out write_delay
+        await settle(lambda: cache.stats['total_writes'] == 1)
+        await cache.set('a', {'v': 2})
+        await cache.patch('a', {'type': 'merge', 'patch': {'w': 1}})
+        await asyncio.sleep(0.1)
+        assert cache.get_stats()['backlog'] == 1
+
+        await cache.stop()
+        stats = cache.get_stats()
+        assert stats['backlog'] == 0 and not stats['flusher_running']
+
+    asyncio.run(main())
+    assert open_store().load('a')[0] == {'v': 2, 'w': 1}
+
+
+def test_entry_budget_evicts_least_recently_used(server, open_store):
+    async def main():
+        cache = server.NodeCache(open_store(), max_entries=2)
+        await cache.set('a', {'v': 'a'})
+        await cache.set('b', {'v': 'b'})
+        await cache.flush_all()
+        await cache.get('a')
+        await cache.set('c', {'v': 'c'})
+        assert list(cache.cache) == ['a', 'c']
+        assert cache.stats['evictions'] == 1
+
+        # An evicted node loads again from the store
+        assert await cache.get('b') == {'v': 'b'}
+        assert cache.stats['cache_misses'] == 1
+        await cache.stop()
+
+    asyncio.run(main())
+
+
+def test_byte_budget_keeps_dirty_nodes_until_written(server, open_store):
+    node = {'text': 'x' * 90}
+    size = server.json_size(node)
+
+    async def main():
+        store = GatedStore(open_store())
+        cache = server.NodeCache(store, max_bytes=2 * size + 10)
+        store.gate.clear()
+        for name in 'abc':
+            await cache.set(name, node)
+        # Over budget, but unwritten nodes are never dropped
+        await asyncio.sleep(0.1)
+        assert list(cache.cache) == ['a', 'b', 'c']
+        assert cache.total_bytes == 3 * size
+
+        store.gate.set()
+        await settle(lambda: cache.get_stats()['backlog'] == 0 and cache.total_bytes <= cache.max_bytes)
+        assert list(cache.cache) == ['b', 'c']
+        assert store.load('a')[0] == node
+
+        await cache.get('a')
+        assert list(cache.cache) == ['c', 'a']
+        assert cache.stats['evictions'] == 2
+        await cache.stop()
+
+    asyncio.run(main())
+
+
+def test_store_io_runs_off_the_event_loop(server, open_store):
+    store = GatedStore(open_store())
+
+    async def main():
+        cache = server.NodeCache(store)
+        await cache.set('a', {'v': 1})
+        await cache.flush_all()
+
+        # A write stuck on disk holds up neither reads of cached nodes nor new updates
+        store.gate.clear()
+        await cache.set('a', {'v': 2})
+        flush = asyncio.ensure_future(cache.flush_all())
+        await settle(lambda: cache.get_stats()['writes_in_flight'] == 1)
+        assert await asyncio.wait_for(cache.get('a'), 1) == {'v': 2}
+        await asyncio.wait_for(cache.set('b', {'v': 3}), 1)
+        assert await asyncio.wait_for(cache.get_many(['a', 'b', 'c']), 1) == {'a': {'v': 2}, 'b': {'v': 3}, 'c': {}}
+
+        store.gate.set()
+        await flush
+        await cache.delete('b')
+        await cache.stop()
+
+    asyncio.run(main())
+    assert len(store.threads) >= 5
+    assert all(name.startswith('node-io') for name in store.threads)
+
+
+def test_bulk_node_endpoints_round_trip(server, open_store, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # A one-entry budget: bulk reads still return every node they asked for
+    monkeypatch.setattr(server, 'node_cache', server.NodeCache(open_store(), max_entries=1))
+    nodes = {'a': {'v': 1}, 'b': {'v': [2, 3]}}
+
+    with TestClient(server.app) as client:
+        response = client.post('/nodes/data', json=nodes)
+        assert response.json() == {'status': 'success', 'count': 2}
+        response = client.get('/nodes/data', params={'names': ['b', 'a', 'missing']})
+        assert response.json() == {**nodes, 'missing': {}}
+        assert client.get('/node/b/data').json() == nodes['b']
+
+    # Shutting down the app flushed both nodes
+    store = open_store()
+    assert {name: store.load(name)[0] for name in nodes} == nodes
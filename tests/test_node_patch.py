@@ -0,0 +1,153 @@
+import asyncio
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+
+from node_store import PatchError, apply_json_patch, apply_merge_patch
+
+
+# RFC 7386, Appendix A
+@pytest.mark.parametrize('target, patch, result', [
+    ({'a': 'b'}, {'a': 'c'}, {'a': 'c'}),
+    ({'a': 'b'}, {'b': 'c'}, {'a': 'b', 'b': 'c'}),
+    ({'a': 'b'}, {'a': None}, {}),
+    ({'a': 'b', 'b': 'c'}, {'a': None}, {'b': 'c'}),
+    ({'a': ['b']}, {'a': 'c'}, {'a': 'c'}),
+    ({'a': 'c'}, {'a': ['b']}, {'a': ['b']}),
+    ({'a': {'b': 'c'}}, {'a': {'b': 'd', 'c': None}}, {'a': {'b': 'd'}}),
+    ({'a': [{'b': 'c'}]}, {'a': [1]}, {'a': [1]}),
+    (['a', 'b'], ['c', 'd'], ['c', 'd']),
+    ({'a': 'b'}, ['c'], ['c']),
+    ({'a': 'foo'}, None, None),
+    ({'a': 'foo'}, 'bar', 'bar'),
+    ({'e': None}, {'a': 1}, {'e': None, 'a': 1}),
+    ([1, 2], {'a': 'b', 'c': None}, {'a': 'b'}),
+    ({}, {'a': {'bb': {'ccc': None}}}, {'a': {'bb': {}}}),
+])
+def test_merge_patch(target, patch, result):
+    original = copy.deepcopy(target)
+    assert apply_merge_patch(target, patch) == result
+    assert target == original
+
+
+# Examples from RFC 6902, Appendix A
+@pytest.mark.parametrize('doc, operations, result', [
+    ({'foo': 'bar'}, [{'op': 'add', 'path': '/baz', 'value': 'qux'}], {'baz': 'qux', 'foo': 'bar'}),
+    ({'foo': ['bar', 'baz']}, [{'op': 'add', 'path': '/foo/1', 'value': 'qux'}], {'foo': ['bar', 'qux', 'baz']}),
+    ({'baz': 'qux', 'foo': 'bar'}, [{'op': 'remove', 'path': '/baz'}], {'foo': 'bar'}),
+    ({'foo': ['bar', 'qux', 'baz']}, [{'op': 'remove', 'path': '/foo/1'}], {'foo': ['bar', 'baz']}),
+    ({'baz': 'qux', 'foo': 'bar'}, [{'op': 'replace', 'path': '/baz', 'value': 'boo'}], {'baz': 'boo', 'foo': 'bar'}),
+    ({'foo': {'bar': 'baz', 'waldo': 'fred'}, 'qux': {'corge': 'grault'}},
+     [{'op': 'move', 'from': '/foo/waldo', 'path': '/qux/thud'}],
+     {'foo': {'bar': 'baz'}, 'qux': {'corge': 'grault', 'thud': 'fred'}}),
+    ({'foo': ['all', 'grass', 'cows', 'eat']}, [{'op': 'move', 'from': '/foo/1', 'path': '/foo/3'}],
+     {'foo': ['all', 'cows', 'eat', 'grass']}),
+    ({'baz': 'qux', 'foo': ['a', 2, 'c']},
+     [{'op': 'test', 'path': '/baz', 'value': 'qux'}, {'op': 'test', 'path': '/foo/1', 'value': 2}],
+     {'baz': 'qux', 'foo': ['a', 2, 'c']}),
+    ({'foo': 'bar'}, [{'op': 'add', 'path': '/child', 'value': {'grandchild': {}}}],
+     {'foo': 'bar', 'child': {'grandchild': {}}}),
+    ({'foo': ['bar']}, [{'op': 'add', 'path': '/foo/-', 'value': ['abc', 'def']}], {'foo': ['bar', ['abc', 'def']]}),
+    ({'/': 9, '~1': 10}, [{'op': 'test', 'path': '/~01', 'value': 10}, {'op': 'copy', 'from': '/~1', 'path': '/a~1b'}],
+     {'/': 9, '~1': 10, 'a/b': 9}),
+    ({'foo': 1}, [{'op': 'replace', 'path': '', 'value': [1]}], [1]),
+])
+def test_json_patch(doc, operations, result):
+    original = copy.deepcopy(doc)
+    assert apply_json_patch(doc, operations) == result
+    assert doc == original
+
+
+@pytest.mark.parametrize('doc, operations', [
+    ({'baz': 'qux'}, [{'op': 'test', 'path': '/baz', 'value': 'bar'}]),
+    ({'foo': 'bar'}, [{'op': 'add', 'path': '/baz/bat', 'value': 'qux'}]),
+    ({'foo': 'bar'}, [{'op': 'remove', 'path': '/baz'}]),
+    ({'foo': ['bar']}, [{'op': 'add', 'path': '/foo/2', 'value': 1}]),
+    ({'foo': ['bar']}, [{'op': 'replace', 'path': '/foo/01', 'value': 1}]),
+    ({'foo': {}}, [{'op': 'move', 'from': '/foo', 'path': '/foo/bar'}]),
+    ({'foo': 'bar'}, [{'op': 'add', 'path': 'foo', 'value': 1}]),
+    ({'foo': 'bar'}, [{'op': 'add', 'path': '/baz'}]),
+    ({'foo': 'bar'}, [{'op': 'frobnicate', 'path': '/foo'}]),
+    ({'foo': 'bar'}, {'op': 'remove', 'path': '/foo'}),
+])
+def test_invalid_json_patch_raises(doc, operations):
+    with pytest.raises(PatchError):
+        apply_json_patch(doc, operations)
+
+
+@pytest.fixture
+def client(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(server, 'node_cache', server.NodeCache(server.FileNodeStore(str(tmp_path / 'nodes'))))
+    with TestClient(server.app) as client:
+        yield client
+
+
+def patch(client, body, content_type):
+    return client.patch('/node/card/data', json=body, headers={'Content-Type': content_type})
+
+
+def test_patch_endpoint_picks_the_patch_type(client):
+    client.post('/node/card/data', json={'title': 'Tower', 'tags': ['major']})
+
+    assert patch(client, [{'op': 'add', 'path': '/tags/-', 'value': 'xvi'}], 'application/json-patch+json').status_code == 200
+    assert patch(client, {'title': 'The Tower', 'draft': None}, 'application/merge-patch+json').status_code == 200
+    # Plain JSON: a list is a JSON patch, an object a merge patch
+    assert patch(client, [{'op': 'remove', 'path': '/tags/0'}], 'application/json').status_code == 200
+    assert patch(client, {'upright': True}, 'application/json').status_code == 200
+    assert client.get('/node/card/data').json() == {'title': 'The Tower', 'tags': ['xvi'], 'upright': True}
+
+
+@pytest.mark.parametrize('body, content_type', [
+    # Results that are not an object
+    (['not', 'an', 'object'], 'application/merge-patch+json'),
+    ('tower', 'application/merge-patch+json'),
+    ([{'op': 'replace', 'path': '', 'value': 16}], 'application/json-patch+json'),
+    # Patches that cannot be applied
+    ([{'op': 'test', 'path': '/title', 'value': 'Moon'}], 'application/json-patch+json'),
+    ({'op': 'remove', 'path': '/title'}, 'application/json-patch+json'),
+])
+def test_rejected_patches_leave_the_node_unchanged(client, body, content_type):
+    client.post('/node/card/data', json={'title': 'Tower'})
+    response = patch(client, body, content_type)
+    assert response.status_code == 422
+    assert client.get('/node/card/data').json() == {'title': 'Tower'}
+
+
+def test_invalid_patch_body_is_a_400(client):
+    response = client.patch('/node/card/data', content=b'{not json', headers={'Content-Type': 'application/json'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('backend', ['files', 'sqlite'])
+def test_patch_log_is_compacted(server, tmp_path, backend):
+    def open_store():
+        if backend == 'files':
+            return server.FileNodeStore(str(tmp_path / 'nodes'))
+        return server.SQLiteNodeStore(str(tmp_path / 'nodes.db'))
+
+    async def settle(cache):
+        await cache.flush_all()
+        assert cache.get_stats()['backlog'] == 0
+
+    async def main():
+        cache = server.NodeCache(open_store(), write_delay=0, compact_entries=3)
+        await cache.set('card', {'count': 0})
+        await settle(cache)
+        logged = []
+        for count in range(1, 6):
+            await cache.patch('card', {'type': 'merge', 'patch': {'count': count}})
+            await settle(cache)
+            store = open_store()
+            data, _, _, log_entries, _ = store.load('card')
+            store.close()
+            assert data == {'count': count}
+            logged.append(log_entries)
+        await cache.stop()
+        return logged, cache.stats
+
+    logged, stats = asyncio.run(main())
+    # Patches are appended until the log holds compact_entries, then data.json is rewritten
+    assert logged == [1, 2, 3, 0, 1]
+    assert stats['log_appends'] == 4 and stats['compactions'] == 1
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+import node_store
+
+
+@pytest.mark.parametrize('backend, store_type', [
+    ('files', node_store.FileNodeStore),
+    ('sqlite', node_store.SQLiteNodeStore),
+])
+def test_create_node_store_honours_node_store(tmp_path, monkeypatch, backend, store_type):
+    monkeypatch.setenv('NODE_STORE', backend)
+    store = node_store.create_node_store(str(tmp_path))
+    assert type(store) is store_type
+    store.write_batch([('card', {'v': 1}, None, None, False)])
+    assert node_store.create_node_store(str(tmp_path)).load('card')[0] == {'v': 1}
+
+
+def test_create_node_store_rejects_unknown_backends(tmp_path, monkeypatch):
+    monkeypatch.setenv('NODE_STORE', 'redis')
+    with pytest.raises(ValueError, match="Unknown NODE_STORE backend: redis"):
+        node_store.create_node_store(str(tmp_path))
+
+
+@pytest.mark.parametrize('backend', ['files', 'sqlite'])
+def test_flask_node_data_uses_the_configured_store(tmp_path, monkeypatch, backend):
+    flask = pytest.importorskip('flask')
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__), '..', 'server'))
+    from routes import nodeData
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('NODE_STORE', backend)
+    monkeypatch.setattr(nodeData, '_node_store', None)
+    app = flask.Flask(__name__)
+    app.register_blueprint(nodeData.node_data)
+    client = app.test_client()
+
+    assert client.post('/node/card/data', json={'v': 1}).status_code == 200
+    assert client.get('/node/card/data').json == {'v': 1}
+    # Written where the workflows server's store for the same NODE_STORE reads it
+    assert node_store.create_node_store(str(tmp_path / 'data')).load('card')[0] == {'v': 1}
+    assert os.path.exists(tmp_path / 'data' / 'card' / 'data.json') == (backend == 'files')
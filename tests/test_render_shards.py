@@ -0,0 +1,45 @@
+import concurrent.futures
+import multiprocessing
+import shutil
+
+import pytest
+
+import stubs
+from stubs import requires_ffmpeg
+
+
+@pytest.fixture
+def shard_pool(server, monkeypatch):
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=2,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=stubs.init_stub_shard_worker,
+        initargs=(1,),
+    )
+    # Only used once a test sets RENDER_SHARDS
+    monkeypatch.setattr(server, '_shard_pool', (pool, 2))
+    yield pool
+    pool.shutdown(cancel_futures=True)
+
+
+@requires_ffmpeg
+def test_sharded_render_matches_serial_render(server, monitor, images, tmp_path, shard_pool, monkeypatch):
+    request = server.InterpolationRequest(image_paths=images, timestamps=[0, 0.5, 1.0, 1.5], fps=8)
+
+    serial = server.run_interpolation(request, images, str(tmp_path / 'serial.mp4'))
+    assert monitor.calls == serial[0] == len(serial[1])
+
+    shutil.rmtree(tmp_path / 'data' / 'segments')
+
+    def not_in_parent():
+        raise AssertionError("pipelines loaded in the parent process")
+
+    # Shard workers load their own pipelines and encode the images themselves
+    monkeypatch.setattr(server, 'RENDER_SHARDS', 2)
+    server.pipeline_registry.register("flux", not_in_parent)
+    monkeypatch.setattr(server, 'encode_images', lambda *args, **kwargs: not_in_parent())
+    sharded = server.run_interpolation(request, images, str(tmp_path / 'sharded.mp4'))
+
+    assert sharded[0] == serial[0]
+    assert len(sharded[1]) == len(serial[1])
+    assert (tmp_path / 'sharded.mp4').read_bytes() == (tmp_path / 'serial.mp4').read_bytes()
@@ -0,0 +1,20 @@
+import os
+
+
+def write(path, size, mtime):
+    path.write_bytes(b'\0' * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_trim_keeps_partial_files_and_pinned_segments(server, tmp_path):
+    for i, name in enumerate(['old.mp4', 'old.png', 'pinned.mp4', 'new.1-2.partial.mp4', 'new.png.tmp', 'newest.mp4']):
+        write(tmp_path / name, 100, 1000 + i)
+
+    with server.segment_pins.pin(['pinned']):
+        server.trim_segment_cache(str(tmp_path), max_bytes=400)
+
+    # The oldest clips go first; in-progress files and pinned segments are skipped
+    assert sorted(os.listdir(tmp_path)) == ['new.1-2.partial.mp4', 'new.png.tmp', 'newest.mp4', 'pinned.mp4']
+
+    server.trim_segment_cache(str(tmp_path), max_bytes=300)
+    assert sorted(os.listdir(tmp_path)) == ['new.1-2.partial.mp4', 'new.png.tmp', 'newest.mp4']